@@ -0,0 +1,490 @@
+"""
+Benchmarks of the dispatch overhead and throughput of the schwimmbad pools.
+
+Each benchmark maps a worker over a set of tasks with every pool and number of
+workers, and records the best and median wall time over a few repeats, along
+with derived numbers like the throughput and the overhead per task. Results are
+written to a JSON file, which can be compared with a previous run to catch
+regressions::
+
+    python benchmarks/run.py --pools serial,thread,multi,joblib,mpi -o new.json
+    python benchmarks/run.py --compare old.json -o new.json
+
+``MPIPool`` benchmarks are run by launching this script with ``mpiexec`` once
+for each number of workers (see ``--mpiexec``).
+"""
+
+import argparse
+import contextlib
+import importlib.metadata
+import itertools
+import json
+import os
+import platform
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+POOLS = ["serial", "thread", "multi", "joblib", "mpi"]
+
+
+# Workers and callbacks. These are defined at the top level of the script so
+# that all of the pools can pickle them.
+
+
+def busy(duration):
+    """Keep the CPU busy for ``duration`` seconds, more precisely than
+    ``time.sleep()`` can for short durations.
+    """
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        pass
+    return duration
+
+
+def noop(task):
+    return task
+
+
+def noop_batch(task):
+    _, batch = task
+    return batch
+
+
+def length(payload):
+    return len(payload)
+
+
+def echo(payload):
+    return payload
+
+
+class BusyCallback:
+    def __init__(self, duration):
+        self.duration = duration
+
+    def __call__(self, _):
+        busy(self.duration)
+
+
+# Benchmarks. Each is a function of the pool, the number of workers, and its
+# parameters, which returns a function that runs the benchmark once along with
+# a dictionary of information about it (e.g., the number of tasks). If the
+# dictionary has an "ideal" entry, the time that the map would take with no
+# overhead, the efficiency and overhead per task are derived from it.
+
+
+def granularity(pool, workers, duration, budget):
+    """Tasks that keep a worker busy for ``duration`` seconds each."""
+    n_tasks = int(min(max(budget * workers / duration, 4 * workers), 100_000))
+    tasks = [duration] * n_tasks
+
+    def run():
+        list(pool.map(busy, tasks))
+
+    return run, {"n_tasks": n_tasks, "ideal": n_tasks * duration / workers}
+
+
+def payload(pool, workers, size, direction, budget_bytes):
+    """Tasks of ``size`` bytes that are sent to the workers and, if
+    ``direction`` is ``"both"``, sent back as results.
+    """
+    n_tasks = int(min(max(budget_bytes // size, workers), 1000))
+    tasks = [bytes(size)] * n_tasks
+    worker = echo if direction == "both" else length
+    moved = n_tasks * size * (2 if direction == "both" else 1)
+
+    def run():
+        list(pool.map(worker, tasks))
+
+    return run, {"n_tasks": n_tasks, "bytes": moved}
+
+
+def task_count(pool, workers, n_tasks):  # noqa: ARG001
+    """Many tasks that do nothing, to measure the overhead per task."""
+    tasks = list(range(n_tasks))
+
+    def run():
+        list(pool.map(noop, tasks))
+
+    return run, {"n_tasks": n_tasks}
+
+
+def batching(pool, workers, n_tasks, mode):
+    """``map()`` versus ``batched_map()`` with one batch per worker."""
+    tasks = list(range(n_tasks))
+    if mode == "map":
+
+        def run():
+            list(pool.map(noop, tasks))
+
+    else:
+
+        def run():
+            list(pool.batched_map(noop_batch, tasks, n_batches=workers))
+
+    return run, {"n_tasks": n_tasks}
+
+
+def callback(pool, workers, n_tasks, cost):
+    """Short tasks with a callback that takes ``cost`` seconds per result."""
+    tasks = [1e-5] * n_tasks
+    cb = BusyCallback(cost) if cost else None
+
+    def run():
+        list(pool.map(busy, tasks, callback=cb))
+
+    return run, {"n_tasks": n_tasks, "ideal": n_tasks * (1e-5 / workers + cost)}
+
+
+def benchmarks(suite):
+    """Yield ``(name, function, params)`` for each benchmark in ``suite``."""
+    full = suite == "full"
+
+    durations = [1e-6, 1e-4, 1e-2] + ([1.0] if full else [])
+    budget = 10.0 if full else 0.5
+    for duration in durations:
+        yield "granularity", granularity, {"duration": duration, "budget": budget}
+
+    sizes = [10, 10_000, 1_000_000] + ([100_000_000, 300_000_000] if full else [])
+    budget_bytes = 1_000_000_000 if full else 50_000_000
+    for size, direction in itertools.product(sizes, ["to_worker", "both"]):
+        params = {"size": size, "direction": direction, "budget_bytes": budget_bytes}
+        yield "payload", payload, params
+
+    for n_tasks in [10, 1000, 10_000] + ([100_000] if full else []):
+        yield "task_count", task_count, {"n_tasks": n_tasks}
+
+    for mode in ["map", "batched_map"]:
+        n_tasks = 100_000 if full else 10_000
+        yield "batching", batching, {"n_tasks": n_tasks, "mode": mode}
+
+    for cost in [0.0, 1e-5, 1e-4] + ([1e-3] if full else []):
+        yield "callback", callback, {"n_tasks": 1000, "cost": cost}
+
+
+# Pools
+
+
+@contextlib.contextmanager
+def make_pool(name, workers):
+    if name == "serial":
+        from schwimmbad import SerialPool
+
+        pool = SerialPool()
+    elif name == "thread":
+        from schwimmbad import ThreadPool
+
+        pool = ThreadPool(workers)
+    elif name == "multi":
+        from schwimmbad import MultiPool
+
+        pool = MultiPool(workers)
+    elif name == "joblib":
+        from schwimmbad import JoblibPool
+
+        pool = JoblibPool(n_jobs=workers)
+    elif name == "mpi":
+        from schwimmbad import MPIPool
+
+        pool = MPIPool()
+    else:
+        msg = f"unknown pool {name!r}"
+        raise ValueError(msg)
+
+    try:
+        yield pool
+    finally:
+        pool.close()
+
+
+def startup_time(name, workers, repeat):
+    """Time creating a pool, running a first task on every worker, and
+    closing it.
+    """
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with make_pool(name, workers) as pool:
+            list(pool.map(noop, range(workers)))
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+# The class of each pool, for the import benchmark:
+POOL_CLASSES = {
+    "serial": "SerialPool",
+    "thread": "ThreadPool",
+    "multi": "MultiPool",
+    "joblib": "JoblibPool",
+    "mpi": "MPIPool",
+}
+
+
+def import_time(name, repeat):
+    """Time importing schwimmbad and the pool class in a new interpreter,
+    which is what every short-lived script and MPI process pays for.
+    """
+    code = (
+        "import time; t0 = time.perf_counter(); import schwimmbad; "
+        f"schwimmbad.{POOL_CLASSES[name]}; print(time.perf_counter() - t0)"
+    )
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code], check=True, capture_output=True, text=True
+        ).stdout
+        times.append(float(output))
+    return times
+
+
+def make_result(name, workers, benchmark, params, times, info):
+    """Summarize the times of a benchmark, and print the result."""
+    best = min(times)
+    result = {
+        "pool": name,
+        "workers": workers,
+        "benchmark": benchmark,
+        "params": params,
+        "times": times,
+        "best": best,
+        "median": statistics.median(times),
+        **info,
+    }
+    if "n_tasks" in info:
+        result["tasks_per_second"] = info["n_tasks"] / best
+    if "bytes" in info:
+        result["bytes_per_second"] = info["bytes"] / best
+    if "ideal" in info:
+        result["efficiency"] = info["ideal"] / best
+        result["overhead_per_task"] = max(best - info["ideal"], 0) / info["n_tasks"]
+    print(format_result(result), flush=True)
+    return result
+
+
+def run_pool(name, workers, args):
+    """Run the benchmarks with one pool, and return a list of results."""
+    selected = set(args.benchmarks.split(",")) if args.benchmarks else None
+    results = []
+
+    def record(benchmark, params, times, info):
+        results.append(make_result(name, workers, benchmark, params, times, info))
+
+    if name != "mpi" and (selected is None or "startup" in selected):
+        record("startup", {}, startup_time(name, workers, args.repeat), {})
+
+    with make_pool(name, workers) as pool:
+        if not pool.is_master():
+            pool.wait()
+            return results
+
+        # Start up the workers (e.g., joblib starts them lazily):
+        list(pool.map(noop, range(4 * workers)))
+
+        for benchmark, func, params in benchmarks(args.suite):
+            if selected is not None and benchmark not in selected:
+                continue
+            run, info = func(pool, workers, **params)
+            times = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                run()
+                times.append(time.perf_counter() - t0)
+            record(benchmark, params, times, info)
+
+    return results
+
+
+def run_mpi(workers, args):
+    """Run the MPIPool benchmarks in a separate ``mpiexec`` job with
+    ``workers`` worker processes, and return the results.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output = os.path.join(tmpdir, "results.json")
+        command = shlex.split(args.mpiexec.format(n=workers + 1))
+        command += [sys.executable, os.path.abspath(__file__), "--mpi-child"]
+        command += ["--suite", args.suite, "--repeat", str(args.repeat)]
+        command += ["--workers", str(workers), "--output", output]
+        if args.benchmarks:
+            command += ["--benchmarks", args.benchmarks]
+        subprocess.run(command, check=True)
+        with open(output) as f:
+            return json.load(f)["results"]
+
+
+# Reporting
+
+
+def format_result(result):
+    params = ", ".join(f"{k}={v}" for k, v in result["params"].items())
+    line = (
+        f"{result['pool']:>6} {result['workers']:>3} {result['benchmark']:<12} "
+        f"{params:<60} best {result['best']:.4g} s"
+    )
+    if "efficiency" in result:
+        line += f", efficiency {result['efficiency']:.2f}"
+    if "bytes_per_second" in result:
+        line += f", {result['bytes_per_second'] / 1e6:.4g} MB/s"
+    elif "tasks_per_second" in result:
+        line += f", {result['tasks_per_second']:.4g} tasks/s"
+    return line
+
+
+def result_key(result):
+    params = json.dumps(result["params"], sort_keys=True)
+    return result["pool"], result["workers"], result["benchmark"], params
+
+
+def compare(results, baseline, threshold):
+    """Print the benchmarks that got slower than in ``baseline`` by more than
+    a factor of ``threshold``, and return how many there are.
+    """
+    previous = {result_key(result): result["best"] for result in baseline}
+    slower = 0
+    for result in results:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        ratio = result["best"] / before
+        if ratio > threshold:
+            slower += 1
+            print(f"SLOWER x{ratio:.2f}: {format_result(result)}")
+    return slower
+
+
+def metadata():
+    versions = {}
+    for package in ["schwimmbad", "numpy", "multiprocess", "dill", "joblib", "mpi4py"]:
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = None
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": sys.version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": versions,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--pools",
+        default="serial,thread,multi,joblib",
+        help=f"Comma-separated pools to benchmark, from: {', '.join(POOLS)}.",
+    )
+    parser.add_argument(
+        "--workers",
+        default=None,
+        help="Comma-separated numbers of workers (default: 1 and the CPU count).",
+    )
+    parser.add_argument(
+        "--suite",
+        choices=["quick", "full"],
+        default="quick",
+        help="The quick suite takes a few minutes; the full suite adds tasks "
+        "that take seconds and payloads of hundreds of MB.",
+    )
+    parser.add_argument(
+        "--benchmarks",
+        default=None,
+        help="Comma-separated benchmarks to run (default: all), from: startup, "
+        "granularity, payload, task_count, batching, callback.",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "-o", "--output", default="benchmark-results.json", help="The JSON file."
+    )
+    parser.add_argument(
+        "--compare",
+        default=None,
+        help="A JSON file from a previous run to compare the results with.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="With --compare, exit with an error if any benchmark is slower by "
+        "more than this factor.",
+    )
+    parser.add_argument(
+        "--mpiexec",
+        default="mpiexec -n {n}",
+        help="The command to launch the MPI benchmarks with; {n} is replaced "
+        "with the number of processes (the workers plus the master).",
+    )
+    parser.add_argument("--mpi-child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.workers is None:
+        workers = sorted({1, os.cpu_count() or 1})
+    else:
+        workers = [int(n) for n in args.workers.split(",")]
+
+    if args.mpi_child:
+        results = run_pool("mpi", workers[0], args)
+        from mpi4py import MPI
+
+        if MPI.COMM_WORLD.Get_rank() == 0:
+            with open(args.output, "w") as f:
+                json.dump({"results": results}, f)
+        return 0
+
+    pools = args.pools.split(",")
+    unknown = set(pools) - set(POOLS)
+    if unknown:
+        msg = f"unknown pools: {', '.join(sorted(unknown))}"
+        raise SystemExit(msg)
+
+    selected = set(args.benchmarks.split(",")) if args.benchmarks else None
+    results = []
+    for name in pools:
+        if selected is None or "import" in selected:
+            times = import_time(name, args.repeat)
+            results.append(make_result(name, 1, "import", {}, times, {}))
+        if selected is not None and selected <= {"import"}:
+            continue
+
+        # The serial pool always has a single worker:
+        for n in [1] if name == "serial" else workers:
+            if name == "mpi":
+                results += run_mpi(n, args)
+            else:
+                results += run_pool(name, n, args)
+
+    with open(args.output, "w") as f:
+        json.dump({"metadata": metadata(), "results": results}, f, indent=1)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
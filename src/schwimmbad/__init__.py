@@ -1,16 +1,46 @@
 # type: ignore
-from typing import Any, Union
+import importlib
+from typing import TYPE_CHECKING, Any, Union
 
 from ._version import version as __version__
-from .jl import JoblibPool
-from .mpi import MPIPool
-from .multiprocessing import MultiPool
-from .serial import SerialPool
+
+if TYPE_CHECKING:
+    from .cache import CachedPool
+    from .jl import JoblibPool
+    from .mpi import MPIPool
+    from .multiprocessing import MultiPool
+    from .serial import SerialPool
+    from .threads import ThreadPool
+
+# The pool classes are imported from their modules on first access (PEP 562),
+# so that importing schwimmbad doesn't import joblib, multiprocess, dill and
+# mpi4py when they aren't used:
+_lazy = {
+    "CachedPool": ".cache",
+    "JoblibPool": ".jl",
+    "MPIPool": ".mpi",
+    "MultiPool": ".multiprocessing",
+    "SerialPool": ".serial",
+    "ThreadPool": ".threads",
+}
+
+
+def __getattr__(name):
+    if name not in _lazy:
+        msg = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(msg)
+    value = getattr(importlib.import_module(_lazy[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
 
 
 def choose_pool(
-    mpi: bool = False, processes: int = 1, **kwargs: Any
-) -> Union[MPIPool, MultiPool, SerialPool]:
+    mpi: bool = False, processes: int = 1, threads: int = 1, **kwargs: Any
+) -> Union["MPIPool", "MultiPool", "ThreadPool", "SerialPool"]:
     """
     Choose between the different pools given options from, e.g., argparse.
 
@@ -24,20 +54,41 @@ def choose_pool(
         :class:`~schwimmbad.multiprocessing.MultiPool`, with this number of
         processes. By default, ``processes=1``, will use the
         :class:`~schwimmbad.serial.SerialPool`.
+    threads : int, optional
+        Use the thread pool, :class:`~schwimmbad.threads.ThreadPool`, with this
+        number of threads. This is ignored if ``mpi`` is ``True`` or
+        ``processes`` is not 1. By default, ``threads=1``, will use the
+        :class:`~schwimmbad.serial.SerialPool`.
     **kwargs
         Any additional kwargs are passed in to the pool class initializer
         selected by the arguments.
+
+    Notes
+    -----
+    Only the module of the selected pool is imported.
     """
 
     if mpi:
+        from .mpi import MPIPool
+
         if not MPIPool.enabled():
             msg = "Tried to run with MPI but MPIPool not enabled."
             raise SystemError(msg)
 
         return MPIPool(**kwargs)
 
-    if processes != 1 and MultiPool.enabled():
-        return MultiPool(processes=processes, **kwargs)
+    if processes != 1:
+        from .multiprocessing import MultiPool
+
+        if MultiPool.enabled():
+            return MultiPool(processes=processes, **kwargs)
+
+    if threads != 1:
+        from .threads import ThreadPool
+
+        return ThreadPool(threads=threads, **kwargs)
+
+    from .serial import SerialPool
 
     return SerialPool(**kwargs)
 
@@ -45,9 +96,10 @@ def choose_pool(
 __all__ = [
     "__version__",
     "choose_pool",
+    "CachedPool",
     "JoblibPool",
     "MPIPool",
     "MultiPool",
     "SerialPool",
-    "choose_pool",
+    "ThreadPool",
 ]
@@ -0,0 +1,278 @@
+# type: ignore
+"""
+A persistent, on-disk cache of the results of ``map()``, so that reruns of a
+parameter sweep only evaluate the tasks that have changed.
+"""
+
+__all__ = ["CachedPool"]
+
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+
+import dill
+
+from .pool import BasePool
+
+# The largest number of keys to look up in a single SQLite query, to stay below
+# the limit on the number of parameters in a statement:
+_max_query_keys = 500
+
+
+def _worker_digest(worker):
+    """Hash a worker function or callable object.
+
+    Functions defined in an importable module are pickled by reference (i.e.,
+    by name), so the compiled code of the function (or of the ``__call__``
+    method of a callable object) is hashed too, so that editing the function
+    invalidates its cached results.
+    """
+    h = hashlib.sha256(dill.dumps(worker))
+    func = getattr(worker, "__func__", worker)
+    code = getattr(func, "__code__", None)
+    if code is None:
+        code = getattr(type(worker).__call__, "__code__", None)
+    if code is not None:
+        h.update(dill.dumps(code))
+    return h.digest()
+
+
+class _KeyPickler(dill.Pickler):
+    """Pickle sets and frozensets with their elements in a fixed order: their
+    iteration order depends on the hashes of the elements, which for strings
+    differ between runs (see ``PYTHONHASHSEED``).
+    """
+
+    def reducer_override(self, obj):
+        if type(obj) in (set, frozenset):
+            return type(obj), (sorted(obj, key=_task_bytes),)
+        return NotImplemented
+
+
+def _task_bytes(task):
+    """Serialize a task for hashing, so that equal tasks give the same bytes in
+    every run.
+
+    The pickler's memo is disabled, as otherwise an object that appears twice
+    in a task pickles differently from two equal but distinct objects. Tasks
+    that contain reference cycles can only be pickled with the memo.
+    """
+    f = io.BytesIO()
+    pickler = _KeyPickler(f)
+    pickler.fast = True
+    try:
+        pickler.dump(task)
+    except RecursionError:
+        f = io.BytesIO()
+        _KeyPickler(f).dump(task)
+    return f.getvalue()
+
+
+class CachedPool(BasePool):
+    """Wrap a pool so that the results of ``map()`` are stored in an on-disk
+    cache, and tasks whose results are already in the cache are not evaluated
+    again.
+
+    Results are keyed by a hash of the ``dill``-serialized worker (including its
+    code) and of each task, and are stored in an SQLite database. Sets and
+    frozensets in tasks are hashed with their elements in sorted order, so that
+    their keys don't change between runs, but other objects whose pickles
+    depend on the order in which they were built (e.g., dictionaries) only hit
+    the cache if they are built the same way. When the database grows beyond
+    ``max_bytes``, the least recently used results are evicted. Only ``map()``
+    (and the methods built on it, e.g., ``batched_map()``, ``imap()`` and
+    ``amap()``) is cached; other methods are passed on to the wrapped pool.
+    Closing this pool closes the cache and the wrapped pool.
+
+    Parameters
+    ----------
+    pool : :class:`~schwimmbad.pool.BasePool`
+        The pool to evaluate the tasks that aren't in the cache with.
+    path : str or path-like
+        The path to the SQLite database file, which is created if it doesn't
+        exist. It can be shared between runs and between pools.
+    max_bytes : int, optional
+        The maximum total size of the cached results, in bytes. Default is
+        ``None``, for no limit.
+
+    Examples
+    --------
+    ::
+
+        with CachedPool(MultiPool(), "sweep-cache.sqlite") as pool:
+            results = pool.map(worker, tasks)
+
+    """
+
+    def __init__(self, pool, path, max_bytes=None):
+        self.pool = pool
+        self.max_bytes = max_bytes
+        self.rank = pool.rank
+        self.size = pool.size
+
+        # The cache can be used from other threads, e.g., by amap(), which runs
+        # map() in the event loop's executor:
+        self._lock = threading.Lock()
+        self._db = None
+        if self.is_master():
+            self._db = sqlite3.connect(os.fspath(path), check_same_thread=False)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    "key BLOB PRIMARY KEY, value BLOB, nbytes INTEGER, atime REAL)"
+                )
+                self._db.execute(
+                    "CREATE INDEX IF NOT EXISTS results_atime ON results (atime)"
+                )
+
+    def is_master(self):
+        return self.pool.is_master()
+
+    def is_worker(self):
+        return self.pool.is_worker()
+
+    def wait(self, *args, **kwargs):
+        return self.pool.wait(*args, **kwargs)
+
+    def map(self, worker, tasks, callback=None, **kwargs):
+        """Like the ``map()`` method of the wrapped pool, but results are looked
+        up in and added to the cache.
+
+        Parameters
+        ----------
+        worker : callable
+            A function or callable object that is executed on each element of
+            the specified ``tasks`` iterable. Its results must be picklable with
+            ``dill``.
+        tasks : iterable
+            A list or iterable of tasks, which must be picklable with ``dill``.
+        callback : callable, optional
+            An optional callback function (or callable) that is called with each
+            result, including results that come from the cache.
+        **kwargs
+            Passed on to the ``map()`` method of the wrapped pool, except for
+            ``return_results=False``, which isn't supported, since the results
+            are needed to cache them.
+
+        Returns
+        -------
+        results : list
+            A list of results from the output of each ``worker()`` call.
+
+        """
+        if not self.is_master():
+            return self.pool.map(worker, tasks, **kwargs)
+
+        if kwargs.get("return_results", True) is False:
+            msg = "CachedPool.map() doesn't support return_results=False"
+            raise ValueError(msg)
+
+        tasks = list(tasks)
+        digest = _worker_digest(worker)
+        keys = [hashlib.sha256(digest + _task_bytes(task)).digest() for task in tasks]
+        cached = self._get(keys)
+
+        results = [None] * len(tasks)
+        missing = []
+        for i, key in enumerate(keys):
+            if key in cached:
+                results[i] = cached[key]
+                if callback is not None:
+                    callback(results[i])
+            else:
+                missing.append(i)
+
+        if missing:
+            new = self.pool.map(
+                worker, [tasks[i] for i in missing], callback=callback, **kwargs
+            )
+            new = list(new)
+            for i, result in zip(missing, new):
+                results[i] = result
+            self._put([(keys[i], result) for i, result in zip(missing, new)])
+
+        return results
+
+    def submit(self, fn, /, *args, **kwargs):
+        """Pass the call on to the wrapped pool, without caching the result."""
+        return self.pool.submit(fn, *args, **kwargs)
+
+    def share(self, data):
+        return self.pool.share(data)
+
+    def clear(self):
+        """Remove all results from the cache."""
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM results")
+            self._db.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        self.pool.close()
+
+    def _get(self, keys):
+        """Return the cached results for any of ``keys`` as a dictionary, and mark
+        them as recently used.
+        """
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _max_query_keys):
+                batch = keys[i : i + _max_query_keys]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, value FROM results WHERE key IN ({placeholders})",
+                    batch,
+                )
+                for key, value in rows:
+                    found[key] = dill.loads(value)
+
+            if found:
+                now = time.time()
+                with self._db:
+                    self._db.executemany(
+                        "UPDATE results SET atime = ? WHERE key = ?",
+                        ((now, key) for key in found),
+                    )
+        return found
+
+    def _put(self, items):
+        """Add ``(key, result)`` pairs to the cache, then evict the least
+        recently used results if the cache is over its size limit.
+        """
+        now = time.time()
+        rows = []
+        for key, result in items:
+            value = dill.dumps(result)
+            rows.append((key, value, len(value), now))
+
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows
+            )
+            if self.max_bytes is None:
+                return
+
+            (total,) = self._db.execute(
+                "SELECT COALESCE(SUM(nbytes), 0) FROM results"
+            ).fetchone()
+            if total <= self.max_bytes:
+                return
+
+            # Walk the results from least to most recently used, and evict
+            # until the total size is within the limit:
+            evict = []
+            for key, nbytes in self._db.execute(
+                "SELECT key, nbytes FROM results ORDER BY atime, rowid"
+            ):
+                if total <= self.max_bytes:
+                    break
+                evict.append((key,))
+                total -= nbytes
+            self._db.executemany("DELETE FROM results WHERE key = ?", evict)
@@ -0,0 +1,140 @@
+# type: ignore
+"""
+Callbacks that receive the results of a map in batches, on a separate thread.
+"""
+
+__all__ = ["BatchCallback"]
+
+import queue
+import threading
+import time
+
+# Put on the queue of a BatchCallback to tell its thread to finish:
+_stop = object()
+
+
+class BatchCallback:
+    """Collect results into lists and pass them to a function on a separate
+    thread.
+
+    An instance can be used as the ``callback`` of any pool's ``map()``: each
+    call just puts the result on a queue, so a slow function (e.g., one that
+    appends to a file) doesn't hold up the dispatch of tasks, and it can
+    process the results in bulk. ``func`` is called with a list of results
+    once ``size`` results have been collected, or ``interval`` seconds after
+    the first result of a batch, whichever comes first. Use the instance as a
+    context manager, or call :meth:`close` after the map, to deliver the last
+    batch and wait for the thread to finish. The ``batch_callback`` argument
+    of :meth:`MPIPool.map <schwimmbad.MPIPool.map>` and
+    :meth:`MultiPool.map <schwimmbad.MultiPool.map>` does this for you.
+
+    If ``func`` raises an exception, no more batches are delivered, and the
+    exception is raised again by the next call of the instance or by
+    :meth:`close`.
+
+    Parameters
+    ----------
+    func : callable
+        The function to call with each list of results.
+    size : int, optional
+        The maximum number of results in a batch. Default is 1000.
+    interval : float, optional
+        The maximum time, in seconds, that a result waits before it is passed
+        to ``func``. Default is 1 second.
+
+    Examples
+    --------
+    ::
+
+        def save(results):
+            with open("results.txt", "a") as f:
+                f.writelines(f"{r}\\n" for r in results)
+
+        with BatchCallback(save, size=100) as callback:
+            pool.map(worker, tasks, callback=callback)
+
+    """
+
+    def __init__(self, func, size=1000, interval=1.0):
+        if size < 1:
+            msg = "size must be >= 1"
+            raise ValueError(msg)
+        self.func = func
+        self.size = int(size)
+        self.interval = interval
+
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._error = None
+
+    def __call__(self, result):
+        if self._error is not None:
+            raise self._error
+
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="schwimmbad-batch-callback", daemon=True
+            )
+            self._thread.start()
+        self._queue.put(result)
+
+    def close(self):
+        """Deliver any remaining results and wait for the thread to finish."""
+        if self._thread is not None:
+            self._queue.put(_stop)
+            self._thread.join()
+            self._thread = None
+
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            try:
+                timeout = None if not batch else max(deadline - time.monotonic(), 0)
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                # The first result in the batch has waited long enough:
+                pass
+            else:
+                if item is _stop:
+                    break
+                if not batch:
+                    deadline = time.monotonic() + self.interval
+                batch.append(item)
+                if len(batch) < self.size:
+                    continue
+
+            self._deliver(batch)
+            batch = []
+
+        self._deliver(batch)
+
+    def _deliver(self, batch):
+        if not batch or self._error is not None:
+            return
+        try:
+            self.func(batch)
+        except Exception as exc:
+            self._error = exc
+
+
+def _chain(*callbacks):
+    """Combine callbacks, skipping any that are ``None``, into one callback."""
+    callbacks = [callback for callback in callbacks if callback is not None]
+    if len(callbacks) <= 1:
+        return callbacks[0] if callbacks else None
+
+    def callback(result):
+        for func in callbacks:
+            func(result)
+
+    return callback
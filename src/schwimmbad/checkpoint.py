@@ -0,0 +1,139 @@
+# type: ignore
+"""
+Journals of completed tasks, used to checkpoint long maps so that they can be
+resumed after being interrupted (see the ``checkpoint`` argument of
+:meth:`MPIPool.map <schwimmbad.MPIPool.map>` and
+:meth:`MultiPool.map <schwimmbad.MultiPool.map>`).
+"""
+
+__all__ = ["Journal"]
+
+import os
+import pickle
+import struct
+import threading
+import time
+from pathlib import Path
+
+# Each record is the length of the pickled (taskid, result) pair as an unsigned
+# 64-bit integer, followed by the pickled pair:
+_header = struct.Struct("<Q")
+
+
+class Journal:
+    """An append-only file of ``(taskid, result)`` records for completed tasks.
+
+    Records are written to a buffered file as results arrive, and the file is
+    flushed and synced to disk at most once every ``sync_interval`` seconds, so
+    that checkpointing doesn't slow down maps with many short tasks. Records
+    that arrive less than ``sync_interval`` seconds after the last sync are
+    synced by a timer thread once the interval is up, so if the process is
+    killed, at most the last ``sync_interval`` seconds of results are lost. A
+    record that was only partially written is discarded when the journal is
+    loaded.
+
+    Parameters
+    ----------
+    path : str or path-like
+        The path to the journal file, which is created if it doesn't exist.
+    sync_interval : float, optional
+        The minimum time between syncs of the file to disk, in seconds. Default
+        is 1 second.
+    """
+
+    def __init__(self, path, sync_interval=1.0):
+        self.path = Path(path)
+        self.sync_interval = sync_interval
+        self._file = None
+        self._last_sync = 0.0
+
+        # The timer that syncs records written since the last sync, and a lock
+        # for the file, which the timer thread syncs:
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read the records in the journal, and return the results as a
+        dictionary keyed by task ID.
+        """
+        results = {}
+        if not self.path.exists():
+            return results
+
+        # Records that pickle couldn't serialize were pickled with dill, which
+        # can also load the others:
+        import dill
+
+        with self.path.open("rb") as f:
+            end = 0
+            while True:
+                header = f.read(_header.size)
+                if len(header) < _header.size:
+                    break
+                (size,) = _header.unpack(header)
+                record = f.read(size)
+                if len(record) < size:
+                    break
+                taskid, result = dill.loads(record)
+                results[taskid] = result
+                end = f.tell()
+
+        # Drop a partial record at the end of the file, so that new records are
+        # appended after the last complete one:
+        if end < self.path.stat().st_size:
+            os.truncate(self.path, end)
+
+        return results
+
+    def append(self, taskid, result):
+        """Add a record for a completed task."""
+        if self._file is None:
+            self._file = self.path.open("ab")
+
+        try:
+            record = pickle.dumps((taskid, result), protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            import dill
+
+            record = dill.dumps((taskid, result), protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            self._file.write(_header.pack(len(record)))
+            self._file.write(record)
+            if self._timer is not None:
+                return
+
+            wait = self._last_sync + self.sync_interval - time.monotonic()
+            if wait <= 0:
+                self._sync()
+            else:
+                self._timer = threading.Timer(wait, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def sync(self):
+        """Flush the records written so far and sync them to disk."""
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def _sync(self):
+        self._timer = None
+        self._last_sync = time.monotonic()
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
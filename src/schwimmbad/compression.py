@@ -0,0 +1,211 @@
+# type: ignore
+"""
+Compression of large serialized tasks and results, for when moving bytes
+between processes is the bottleneck (see the ``compression`` argument of
+:class:`~schwimmbad.MultiPool` and :class:`~schwimmbad.MPIPool`).
+"""
+
+__all__ = ["Compressor"]
+
+import itertools
+import os
+import time
+import weakref
+import zlib
+
+# Each payload starts with one byte that says how the rest of it is
+# compressed, so that payloads can be decompressed without knowing whether
+# (or with which codec) the sender compressed them:
+_codec_ids = {None: 0, "zlib": 1, "lz4": 2, "zstd": 3}
+_codec_names = {i: name for name, i in _codec_ids.items()}
+
+# Compressors in this process, by token, so that unpickling a compressor that
+# was sent along with a task (e.g., to a MultiPool worker) reuses the same
+# instance and its adaptive state:
+_instances = weakref.WeakValueDictionary()
+_tokens = itertools.count()
+
+
+def _available(codec):
+    try:
+        if codec == "lz4":
+            import lz4.frame  # noqa: F401
+        elif codec == "zstd":
+            import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _compress(codec, data, level):
+    if codec == "zlib":
+        return zlib.compress(data, 1 if level is None else level)
+    if codec == "lz4":
+        import lz4.frame
+
+        return lz4.frame.compress(data, compression_level=level or 0)
+    import zstandard
+
+    return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+
+def _decompress(codec, data):
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "lz4":
+        import lz4.frame
+
+        return lz4.frame.decompress(data)
+    import zstandard
+
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _restore(token, kwargs):
+    compressor = _instances.get(token)
+    if compressor is None:
+        compressor = Compressor(**kwargs)
+        compressor._token = token
+        _instances[token] = compressor
+    return compressor
+
+
+class Compressor:
+    """Compress payloads above a size threshold, and stop trying when they
+    don't compress well.
+
+    Payloads smaller than ``threshold`` bytes are sent as they are. Larger
+    payloads are compressed, unless the compressed size is more than
+    ``max_ratio`` times the original size, in which case the original is sent
+    and compression is skipped for the next payload above the threshold. Each
+    further poor result doubles the number of payloads skipped (up to 1024),
+    and a good result starts compressing every payload again. This keeps the
+    cost low when the data turn out not to be compressible (e.g., random
+    floating-point numbers).
+
+    Each process (the master and every worker) adapts independently. The
+    master counts the bytes it sends and receives, before and after
+    compression; see :meth:`counters`, which is included in the
+    :class:`~schwimmbad.stats.MapStats` of a map.
+
+    Parameters
+    ----------
+    codec : str, optional
+        ``"zlib"``, ``"lz4"`` (requires ``lz4``), ``"zstd"`` (requires
+        ``zstandard``), or ``"auto"`` (the default), for the fastest of these
+        that is installed: ``lz4``, then ``zstd``, then ``zlib``.
+    threshold : int, optional
+        The smallest payload, in bytes, to compress. Default is 64 KiB.
+    max_ratio : float, optional
+        The largest compressed-to-original size ratio for which compression is
+        considered worthwhile. Default is 0.9.
+    level : int, optional
+        The compression level, with the codec's fast default if ``None``.
+    """
+
+    max_skip = 1024
+
+    def __init__(self, codec="auto", threshold=64 * 1024, max_ratio=0.9, level=None):
+        if codec == "auto":
+            codec = next(c for c in ["lz4", "zstd", "zlib"] if _available(c))
+        if codec not in _codec_ids or codec is None:
+            msg = f"Unknown compression codec {codec!r}"
+            raise ValueError(msg)
+        if not _available(codec):
+            package = {"lz4": "lz4", "zstd": "zstandard"}[codec]
+            msg = f"{package} is required to compress with {codec}"
+            raise ImportError(msg)
+
+        self.codec = codec
+        self.threshold = int(threshold)
+        self.max_ratio = max_ratio
+        self.level = level
+
+        # How many payloads above the threshold to skip, and how many to skip
+        # after the next poor result:
+        self._skip = 0
+        self._next_skip = 1
+        self._counters = dict.fromkeys(
+            [
+                "payloads",
+                "compressed",
+                "raw_bytes",
+                "wire_bytes",
+                "compress_time",
+                "decompress_time",
+            ],
+            0,
+        )
+
+        self._token = (os.getpid(), next(_tokens))
+        _instances[self._token] = self
+
+    def __reduce__(self):
+        kwargs = {
+            "codec": self.codec,
+            "threshold": self.threshold,
+            "max_ratio": self.max_ratio,
+            "level": self.level,
+        }
+        return _restore, (self._token, kwargs)
+
+    def __repr__(self):
+        return f"Compressor(codec={self.codec!r}, threshold={self.threshold})"
+
+    def counters(self):
+        """Return a dictionary of the number of payloads compressed or
+        decompressed by this process (``"payloads"``), how many of them were
+        actually compressed (``"compressed"``), their total size before
+        (``"raw_bytes"``) and after (``"wire_bytes"``) compression, and the time
+        spent compressing and decompressing, in seconds.
+        """
+        return dict(self._counters)
+
+    def compress(self, data):
+        """Return ``data``, compressed if worthwhile, with a one-byte header."""
+        n = len(data)
+        out = None
+        if n >= self.threshold:
+            if self._skip:
+                self._skip -= 1
+            else:
+                t0 = time.perf_counter()
+                out = _compress(self.codec, data, self.level)
+                self._counters["compress_time"] += time.perf_counter() - t0
+
+                if len(out) > self.max_ratio * n:
+                    out = None
+                    self._skip = self._next_skip
+                    self._next_skip = min(2 * self._next_skip, self.max_skip)
+                else:
+                    self._next_skip = 1
+
+        if out is None:
+            out = bytes([_codec_ids[None]]) + data
+        else:
+            out = bytes([_codec_ids[self.codec]]) + out
+            self._counters["compressed"] += 1
+        self._count(n, len(out))
+        return out
+
+    def decompress(self, data):
+        """Decompress a payload returned by :meth:`compress`, and return it as
+        a bytes-like object.
+        """
+        codec = _codec_names[data[0]]
+        data = memoryview(data)[1:]
+        if codec is None:
+            # Avoid copying large payloads that weren't compressed:
+            out = data
+        else:
+            t0 = time.perf_counter()
+            out = _decompress(codec, data)
+            self._counters["decompress_time"] += time.perf_counter() - t0
+            self._counters["compressed"] += 1
+        self._count(len(out), len(data) + 1)
+        return out
+
+    def _count(self, raw, wire):
+        self._counters["payloads"] += 1
+        self._counters["raw_bytes"] += raw
+        self._counters["wire_bytes"] += wire
@@ -33,7 +33,58 @@ class JoblibPool(BasePool):
     def enabled():
         return Parallel is not None
 
-    def map(self, func, iterable, callback=None):
+    def map(self, func, iterable, callback=None, cost=None):
+        """Evaluate a function on each element of ``iterable`` with
+        ``joblib.Parallel``.
+
+        If ``cost`` is specified, either as a function of a task or as a
+        sequence with one number per task, the tasks with the highest expected
+        cost are dispatched first. The results are always returned in the same
+        order as ``iterable``.
+        """
+        if cost is not None:
+            return self._map_by_cost(
+                lambda tasks: self.map(func, tasks, callback), iterable, cost
+            )
+
+        if self._collecting_stats(func):
+            # Record the results as they arrive, rather than at the end of the
+            # map:
+            return self._map_with_stats(self.imap_unordered, func, iterable, callback)
+
         dfunc = delayed(func)
         res = Parallel(*(self.args), **(self.kwargs))(dfunc(a) for a in iterable)
         return self._call_callback(callback, res)
+
+    def imap(self, func, iterable, callback=None):
+        """Lazily evaluate a function on each element of ``iterable``, yielding
+        the results in order as they are completed.
+
+        Tasks are pulled from ``iterable`` as they are dispatched (see the
+        ``pre_dispatch`` argument of ``joblib.Parallel``), so this can be used
+        with very large generators of tasks. This requires ``joblib>=1.3``:
+        with older versions, the results are computed with :meth:`map` first.
+        """
+        return self._imap(func, iterable, callback, "generator")
+
+    def imap_unordered(self, func, iterable, callback=None):
+        """Like :meth:`JoblibPool.imap`, but results are yielded in the order
+        they are completed. This requires ``joblib>=1.4``: with older versions,
+        results are yielded in the same order as ``iterable``.
+        """
+        return self._imap(func, iterable, callback, "generator_unordered")
+
+    def _imap(self, func, iterable, callback, return_as):
+        kwargs = {**self.kwargs, "return_as": return_as}
+        try:
+            parallel = Parallel(*(self.args), **kwargs)
+        except (TypeError, ValueError):
+            # This version of joblib doesn't support return_as, or this value
+            # of it. Any other error is raised again by map():
+            if return_as == "generator":
+                return BasePool.imap(self, func, iterable, callback)
+            return BasePool.imap_unordered(self, func, iterable, callback)
+
+        dfunc = delayed(func)
+        res = parallel(dfunc(a) for a in iterable)
+        return self._call_callback(callback, res)
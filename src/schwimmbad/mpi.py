@@ -1,9 +1,17 @@
 # type: ignore
-__all__ = ["MPIPool", "MPI"]
+__all__ = ["MPIPool", "MPI", "MPISharedData"]
 
+import asyncio
 import atexit
+import concurrent.futures
+import functools
+import itertools
+import operator
 import sys
+import threading
+import time
 import traceback
+from collections import deque
 
 # On some systems mpi4py is available but broken we avoid crashes by importing
 # it only when an MPI Pool is explicitly created.
@@ -11,13 +19,56 @@ import traceback
 MPI = None
 
 # Project
+from .callbacks import BatchCallback, _chain
+from .error import PoolError
 from .pool import BasePool
+from .serializers import get_serializer
+from .shared import SharedData, _as_buffer, _from_buffer
+
+# Node-local shared memory windows created with MPIPool.share() in this process,
+# keyed by the ID of the corresponding MPISharedData handle:
+_windows = {}
+_window_ids = itertools.count()
+
+# The largest number of bytes to broadcast in a single MPI call, to stay below
+# the maximum count of MPI-3 implementations:
+_max_bcast_bytes = 2**30
 
 
 def _dummy_callback(x):
     pass
 
 
+class _Backoff:
+    """How long to wait between polls for messages: not at all for the first
+    ``spin_time`` seconds, so that replies that come back quickly are picked
+    up without the latency of a sleep, then sleeps that double in length up to
+    ``max_interval`` seconds.
+    """
+
+    def __init__(self, spin_time, max_interval):
+        self.spin_time = spin_time
+        self.max_interval = max_interval
+        self.reset()
+
+    def reset(self):
+        """Start spinning again, e.g., after a message arrived."""
+        self._deadline = None
+        self._delay = 1e-5
+
+    def next(self):
+        """Return the time to sleep before the next poll, in seconds."""
+        now = time.perf_counter()
+        if self._deadline is None:
+            self._deadline = now + self.spin_time
+        if now < self._deadline:
+            return 0.0
+
+        delay = self._delay
+        self._delay = min(2 * delay, self.max_interval)
+        return delay
+
+
 def _import_mpi(quiet=False, use_dill=False):
     global MPI
     try:
@@ -36,6 +87,160 @@ def _import_mpi(quiet=False, use_dill=False):
     return MPI
 
 
+def _import_pkl5(use_dill=False):
+    try:
+        from mpi4py.util import pkl5
+    except ImportError:
+        msg = "Sending out-of-band buffers with use_pkl5 requires mpi4py>=3.1"
+        raise ImportError(msg) from None
+
+    if use_dill:
+        import dill
+
+        pkl5.pickle.__init__(dill.dumps, dill.loads, dill.HIGHEST_PROTOCOL)
+
+    return pkl5
+
+
+def _split_groups(comm, groups):
+    """Split ``comm`` into groups for a hierarchical :class:`MPIPool`.
+
+    Rank 0 is kept on its own, and the other ranks are split into one group per
+    node (``groups="node"``) or into groups of ``groups`` consecutive ranks.
+    Returns the communicator for the group that this rank belongs to, and a
+    communicator between rank 0 and the first rank of each group (the group's
+    "sub-master"), which is ``MPI.COMM_NULL`` on all other ranks.
+    """
+    rank = comm.Get_rank()
+    if groups == "node":
+        node_comm = comm.Split_type(MPI.COMM_TYPE_SHARED, key=rank)
+        group_comm = node_comm.Split(0 if rank == 0 else 1, key=rank)
+        node_comm.Free()
+    elif isinstance(groups, int) and groups >= 1:
+        group_comm = comm.Split(0 if rank == 0 else 1 + (rank - 1) // groups, key=rank)
+    else:
+        msg = "groups must be 'node' or a positive integer"
+        raise ValueError(msg)
+
+    color = 0 if group_comm.Get_rank() == 0 else MPI.UNDEFINED
+    top_comm = comm.Split(color, key=rank)
+    return group_comm, top_comm
+
+
+def _store_results(resultlist, taskid, results):
+    """Put the results of a chunk of tasks starting at ``taskid`` in place in
+    ``resultlist``, growing it if needed.
+    """
+    end = taskid + len(results)
+    if end > len(resultlist):
+        resultlist.extend([None] * (end - len(resultlist)))
+    resultlist[taskid:end] = results
+
+
+def _steal_victims(queued, stealing):
+    """Return the workers to ask to give back the chunks of tasks they haven't
+    started: those with the most chunks queued up, one for each idle worker
+    that a steal isn't already in progress for.
+
+    ``queued`` is the number of chunks queued up on each worker, and
+    ``stealing`` the workers that have been asked to give back chunks but
+    haven't replied yet.
+    """
+    idle = sum(1 for n in queued.values() if n == 0)
+    victims = sorted(
+        (w for w in queued if queued[w] > 1 and w not in stealing),
+        key=queued.get,
+        reverse=True,
+    )
+    return victims[: max(idle - len(stealing), 0)]
+
+
+def _next_tag(tag, in_use, tag_ub):
+    """Return the MPI tag to send the next chunk of tasks with: the first one
+    after ``tag`` that isn't ``in_use`` by a chunk in flight, wrapping around so
+    that tags stay at or below ``tag_ub``.
+    """
+    for _ in range(tag_ub + 1):
+        tag = (tag + 1) % (tag_ub + 1)
+        if tag not in in_use:
+            return tag
+
+    msg = f"All {tag_ub + 1} MPI tags are in use by chunks of tasks in flight"
+    raise PoolError(msg)
+
+
+def _apply(call):
+    """Run a call made with :meth:`MPIPool.submit` on a worker, returning any
+    exception it raises along with its formatted traceback.
+    """
+    fn, args, kwargs = call
+    try:
+        return True, fn(*args, **kwargs), None
+    except Exception as exc:
+        return False, exc, traceback.format_exc()
+
+
+class _RemoteTraceback(Exception):
+    """Set as the cause of an exception raised by a call on a worker, to show
+    the traceback from the worker.
+    """
+
+    def __init__(self, tb):
+        self.tb = tb
+
+    def __str__(self):
+        return self.tb
+
+
+class _Steal:
+    """Sent by the master to ask a worker to give back the tasks it has queued
+    but not started yet.
+    """
+
+
+class _Unshare:
+    """Sent by the master to free the shared memory window of a handle created
+    with :meth:`MPIPool.share` (see :meth:`MPIPool.release`).
+    """
+
+    def __init__(self, id):
+        self.id = id
+
+
+class _Released:
+    """Sent by a worker in reply to :class:`_Steal`, with the tags of the chunks
+    of tasks it gave back.
+    """
+
+    def __init__(self, tags):
+        self.tags = tags
+
+
+class MPISharedData(SharedData):
+    """A handle to a read-only array or bytes blob in a node-local MPI shared
+    memory window, created with :meth:`MPIPool.share`.
+
+    Pickling the handle only sends its ID, and calling ``handle.get()`` on any
+    rank of the pool returns a zero-copy, read-only view of the one copy of the
+    data on that rank's node: a NumPy array for array data and a
+    :class:`memoryview` for bytes-like data.
+    """
+
+    def __init__(self, id, nbytes, shape=None, dtype=None):
+        self.id = id
+        self.nbytes = nbytes
+        self.shape = shape
+        self.dtype = dtype
+
+    def get(self):
+        """Return a read-only view of the shared data."""
+        if self.id not in _windows:
+            msg = "This shared data has been released"
+            raise PoolError(msg)
+        _, mem = _windows[self.id]
+        return _from_buffer(mem[: self.nbytes], self.shape, self.dtype)
+
+
 class MPIPool(BasePool):
     """A processing pool that distributes tasks using MPI.
 
@@ -53,13 +258,122 @@ class MPIPool(BasePool):
         An MPI communicator to distribute tasks with. If ``None``, this uses
         ``MPI.COMM_WORLD`` by default.
     use_dill: Set `True` to use `dill` serialization. Default is `False`.
+    prefetch : int, optional
+        The maximum number of tasks that can be in flight to each worker at a
+        time. With the default, ``prefetch=1``, a worker only receives a new task
+        after the master has received the result of its previous task. Larger
+        values let workers queue up tasks so that they don't sit idle for a
+        full round trip to the master between tasks, which helps when
+        individual tasks are short. Once there are no new tasks left, workers
+        that run out of work take over tasks still queued on busy workers, so
+        a worker stuck on a slow task doesn't hold up the tasks queued behind
+        it.
+    use_pkl5 : bool, optional
+        Set ``True`` to serialize tasks and results with pickle protocol 5 and
+        send any large buffers they contain (e.g., contiguous NumPy arrays)
+        out-of-band, directly with buffer-based MPI sends. This avoids copying
+        large arrays into and out of the pickle data on both sides of each
+        message. Requires ``mpi4py>=3.1``. Default is ``False``.
+    groups : str or int, optional
+        Distribute tasks hierarchically, so that the master process isn't a
+        bottleneck with very many workers. The workers are split into one group
+        per node (``groups="node"``) or into groups of ``groups`` ranks, and
+        the master only sends batches of tasks to the first rank of each group.
+        That rank then acts as a "sub-master", distributing the tasks in each
+        batch to the other ranks in its group (with guided chunking) and sending
+        the results back to the master together. The batches sent to a group
+        are ``chunksize`` times the number of workers in the group in size.
+        Consider also setting ``prefetch=2``, so that sub-masters have their
+        next batch ready when they finish a batch. Default is ``None``, for a
+        single master that sends tasks to all workers directly.
+    serializer : str or :class:`~schwimmbad.serializers.Serializer`, optional
+        How to serialize tasks and results: ``"pickle"``, ``"dill"``,
+        ``"cloudpickle"`` or ``"msgpack"``, or a
+        :class:`~schwimmbad.serializers.Serializer` (see
+        :func:`~schwimmbad.serializers.get_serializer`). Chunks of tasks and
+        their results are then serialized to bytes before they are sent. By
+        default (``None``), ``mpi4py`` pickles tasks and results as it sends
+        them, with the standard library :mod:`pickle` (or ``dill`` if
+        ``use_dill``), which avoids copying the serialized data. In all cases,
+        the worker function is serialized once per map with the serializer's
+        ``dumps_function()``, i.e., with ``dill`` unless ``"cloudpickle"`` is
+        used, so that ``use_dill`` isn't needed to send lambdas or closures.
+    compression : bool, str or :class:`~schwimmbad.compression.Compressor`, optional
+        Compress serialized chunks of tasks and results that are larger than
+        64 KiB, as long as they compress well: ``True`` for the fastest
+        available codec, the name of a codec (``"zlib"``, ``"lz4"`` or
+        ``"zstd"``), or a :class:`~schwimmbad.compression.Compressor` to set the
+        threshold and other options. Tasks and results are then serialized to
+        bytes before they are sent, with ``serializer`` (``"pickle"`` by
+        default). Default is ``None``, for no compression.
     """
 
-    def __init__(self, comm=None, use_dill=False):
+    # While waiting for results, the master polls for incoming messages: first
+    # continuously, for up to spin_time seconds, so that fine-grained maps
+    # don't pay for the latency of sleeping, and then with sleeps between polls
+    # that double up to max_poll_interval seconds. Blocking MPI calls
+    # busy-wait in most MPI implementations, which would keep the master at
+    # 100% CPU usage.
+    spin_time = 1e-3
+    max_poll_interval = 1e-3
+
+    def __init__(
+        self,
+        comm=None,
+        use_dill=False,
+        prefetch=1,
+        use_pkl5=False,
+        groups=None,
+        serializer=None,
+        compression=None,
+    ):
         MPI = _import_mpi(use_dill=use_dill)
 
+        # The serializer for worker functions, which is also used for tasks and
+        # results if one was given explicitly or they are compressed:
+        self._serializer = get_serializer(serializer, compression)
+        self._serialize_data = serializer is not None or bool(compression)
+
+        if prefetch < 1:
+            msg = "prefetch must be >= 1"
+            raise ValueError(msg)
+        self.prefetch = int(prefetch)
+
         if comm is None:
             comm = MPI.COMM_WORLD
+
+        # The communicator over all ranks, which share() creates node-local
+        # windows on, and the communicators it uses, created when first needed:
+        self._world = comm
+        self._node_comm = None
+        self._leader_comm = None
+
+        # In a hierarchical pool, the pool that a sub-master uses to distribute
+        # tasks within its group, and the number of workers each sub-master has:
+        self._local = None
+        n_group_workers = 1
+        if groups is not None:
+            group_comm, top_comm = _split_groups(comm, groups)
+            if top_comm == MPI.COMM_NULL:
+                # Take tasks from the sub-master of this rank's group:
+                comm = group_comm
+            else:
+                comm = top_comm
+                if group_comm.Get_size() > 1 and comm.Get_rank() != 0:
+                    self._local = MPIPool(
+                        comm=group_comm,
+                        use_dill=use_dill,
+                        prefetch=prefetch,
+                        use_pkl5=use_pkl5,
+                        serializer=serializer,
+                        compression=compression,
+                    )
+                    self._local._world = self._world
+                    n_group_workers = self._local.size
+                n_group_workers = comm.gather(n_group_workers, root=0)
+
+        if use_pkl5:
+            comm = _import_pkl5(use_dill=use_dill).Intracomm(comm)
         self.comm = comm
 
         self.master = 0
@@ -84,7 +398,34 @@ class MPIPool(BasePool):
 
         self.workers = set(range(self.comm.size))
         self.workers.discard(self.master)
-        self.size = self.comm.Get_size() - 1
+
+        # How many processes are behind each worker: one, unless the "worker"
+        # is the sub-master of a group in a hierarchical pool.
+        if groups is None:
+            self._weights = dict.fromkeys(self.workers, 1)
+        else:
+            self._weights = {w: n_group_workers[w] for w in self.workers}
+        self.size = sum(self._weights.values())
+
+        # Chunks of tasks are sent with tags that wrap around below this bound
+        # (at least 32767 by the MPI standard), see _next_tag():
+        self._tag_ub = MPI.COMM_WORLD.Get_attr(MPI.TAG_UB)
+
+        # The serialized worker callable most recently shipped to each worker,
+        # so that it is only re-sent when it changes between maps:
+        self._worker_funcs = {}
+
+        # Whether a map is in progress, i.e. there may be tasks out with workers:
+        self._busy = False
+
+        # Handles of the data shared with share(), released on close:
+        self._shared = []
+
+        # Calls made with submit() that haven't been sent to a worker yet, and
+        # the thread that sends them out and collects their results:
+        self._calls = deque()
+        self._calls_lock = threading.Lock()
+        self._calls_thread = None
 
         if self.size == 0:
             msg = (
@@ -111,22 +452,545 @@ class MPIPool(BasePool):
 
         # worker = self.comm.rank
         status = MPI.Status()
+        func = None
+        queue = deque()
         while True:
-            task = self.comm.recv(source=self.master, tag=MPI.ANY_TAG, status=status)
+            # Block until there is at least one message, then also take any
+            # other tasks the master has already sent (see ``prefetch``) so that
+            # those sends can complete while this worker is busy. The first
+            # probe after a long task may only make progress on incoming
+            # messages without matching them, so probe once beforehand:
+            self.comm.Iprobe(source=self.master, tag=MPI.ANY_TAG)
+            while not queue or self.comm.Iprobe(source=self.master, tag=MPI.ANY_TAG):
+                task = self.comm.recv(
+                    source=self.master, tag=MPI.ANY_TAG, status=status
+                )
+                if isinstance(task, _Steal):
+                    # Only chunks of tasks from the current map can be queued
+                    # here, so give all of them back to the master:
+                    released = _Released([tag for tag, _ in queue])
+                    queue.clear()
+                    self.comm.send(released, self.master, 0)
+                    continue
+
+                if isinstance(task, tuple):
+                    # The master only sends the (pickled) callable when it
+                    # differs from the one this worker already has, otherwise
+                    # it sends None. Load it right away, as the chunk it came
+                    # with may be given back before it is run:
+                    func_bytes, task = task
+                    if func_bytes is not None:
+                        func = self._serializer.loads_function(func_bytes)
 
+                queue.append((status.tag, task))
+                if task is None:
+                    break
+
+            tag, task = queue.popleft()
             if task is None:
                 break
 
-            func, arg = task
+            if isinstance(task, MPISharedData):
+                if self._local is not None:
+                    # Every rank takes part in creating the window:
+                    for worker in self._local.workers:
+                        self._local.comm.send(task, worker, 0)
+                self._share(task)
+                continue
+
+            if isinstance(task, _Unshare):
+                if self._local is not None:
+                    for worker in self._local.workers:
+                        self._local.comm.send(task, worker, 0)
+                self._unshare(task.id)
+                continue
+
+            chunk = self._serializer.loads(task) if self._serialize_data else task
+            if self._local is None:
+                results = [func(arg) for arg in chunk]
+            else:
+                results = self._local.map(func, chunk, chunksize="guided")
 
-            result = func(arg)
+            if self._serialize_data:
+                results = self._serializer.dumps(results)
+            self.comm.send(results, self.master, tag)
 
-            self.comm.send(result, self.master, status.tag)
+        if self._local is not None:
+            self._local.close()
 
         if callback is not None:
             callback()
 
-    def map(self, worker, tasks, callback=None, return_results=True):
+    def share(self, data):
+        """Share a large, read-only NumPy array or bytes-like object with the
+        workers, storing only one copy of the data per node.
+
+        The communicator is split into one communicator per node (with
+        ``Split_type(COMM_TYPE_SHARED)``) and an MPI-3 shared memory window is
+        allocated on each node. The data is broadcast from the master to one
+        rank per node, which copies it into the window. The returned handle can
+        be passed to the worker function in place of the data (e.g., with
+        :func:`functools.partial`); pickling it only sends its ID, and calling
+        ``handle.get()`` in a worker returns a zero-copy, read-only view of the
+        node's copy of the data.
+
+        This must be called on the master process, and not while a map is in
+        progress. The memory is freed on every rank by :meth:`release`, or when
+        the pool is closed.
+
+        Parameters
+        ----------
+        data : array-like or bytes-like
+            The data to share. Arrays must have a fixed-size data type.
+
+        Returns
+        -------
+        handle : :class:`~schwimmbad.mpi.MPISharedData`
+        """
+        if self.is_worker():
+            msg = "share() must be called on the master process"
+            raise PoolError(msg)
+
+        if self._busy:
+            msg = "Cannot share data while a map on this pool is in progress"
+            raise PoolError(msg)
+
+        buf, shape, dtype = _as_buffer(data)
+        handle = MPISharedData(next(_window_ids), buf.nbytes, shape, dtype)
+
+        # All ranks have to take part in creating the window:
+        for worker in self.workers:
+            self.comm.send(handle, worker, 0)
+        self._share(handle, buf)
+        self._shared.append(handle)
+
+        return handle
+
+    def release(self, handle):
+        """Free the shared memory of a handle returned by :meth:`share`, on
+        every node.
+
+        Views of the data returned by ``handle.get()`` must not be used
+        afterwards, on any rank, and calling ``handle.get()`` raises an error.
+        This must be called on the master process, and not while a map is in
+        progress.
+
+        Parameters
+        ----------
+        handle : :class:`~schwimmbad.mpi.MPISharedData`
+            The handle returned by :meth:`share`.
+        """
+        if self.is_worker():
+            msg = "release() must be called on the master process"
+            raise PoolError(msg)
+
+        if self._busy:
+            msg = "Cannot release shared data while a map on this pool is in progress"
+            raise PoolError(msg)
+
+        if handle not in self._shared:
+            return
+        self._shared.remove(handle)
+
+        # Freeing a window is collective, like creating it:
+        for worker in self.workers:
+            self.comm.send(_Unshare(handle.id), worker, 0)
+        self._unshare(handle.id)
+
+    def _share(self, handle, buf=None):
+        """Collectively create the shared memory window for ``handle``. On the
+        master, ``buf`` holds the data to copy into the window.
+        """
+        if self._node_comm is None:
+            rank = self._world.Get_rank()
+            self._node_comm = self._world.Split_type(MPI.COMM_TYPE_SHARED, key=rank)
+            color = 0 if self._node_comm.Get_rank() == 0 else MPI.UNDEFINED
+            self._leader_comm = self._world.Split(color, key=rank)
+
+        # Only the first rank on each node allocates memory, which the other
+        # ranks on the node then access directly:
+        is_leader = self._node_comm.Get_rank() == 0
+        size = handle.nbytes if is_leader else 0
+        win = MPI.Win.Allocate_shared(size, 1, comm=self._node_comm)
+        mem, _ = win.Shared_query(0)
+        mem = memoryview(mem).cast("B")
+
+        if is_leader:
+            # The master is the first rank in the leader communicator, and
+            # copies the data directly into its window before broadcasting:
+            if buf is not None:
+                mem[: handle.nbytes] = buf
+            for i in range(0, handle.nbytes, _max_bcast_bytes):
+                block = mem[i : i + _max_bcast_bytes]
+                self._leader_comm.Bcast([block, MPI.BYTE], root=0)
+
+        # Make sure the data is in place before anyone reads it:
+        win.Fence()
+        _windows[handle.id] = (win, mem)
+
+    def _unshare(self, id):
+        """Collectively free the shared memory window with the given ID."""
+        win, _ = _windows.pop(id)
+        win.Free()
+
+    def _wait_for_message(self):
+        """Block until a message from any worker is ready to be received."""
+        backoff = _Backoff(self.spin_time, self.max_poll_interval)
+        while not self.comm.Iprobe(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG):
+            delay = backoff.next()
+            if delay:
+                time.sleep(delay)
+
+    def _dispatch(
+        self, worker, tasks, chunksize=1, lookahead=None, ordered=False, block=True
+    ):
+        """Send chunks of tasks out to the workers and yield ``(taskid, results)``
+        for each chunk as the results come back, where ``taskid`` is the index
+        of the chunk's first task.
+
+        Tasks are pulled lazily from ``tasks``. If ``lookahead`` is specified, at
+        most that many chunks are taken from ``tasks`` before their results have
+        been yielded. If ``ordered``, chunks are yielded in task order. If not
+        ``block``, ``None`` is yielded whenever the master would otherwise wait
+        for a worker to reply, so that the caller can wait asynchronously (see
+        :meth:`_adispatch`).
+        """
+        guided = chunksize == "guided"
+        if not guided and (isinstance(chunksize, str) or chunksize < 1):
+            msg = "chunksize must be a positive integer or 'guided'"
+            raise ValueError(msg)
+
+        if lookahead is not None and lookahead < 1:
+            msg = "lookahead must be >= 1"
+            raise ValueError(msg)
+
+        if self._busy:
+            msg = (
+                "Another map on this pool still has tasks in flight (e.g., from a "
+                "partially consumed imap); finish or close it first."
+            )
+            raise PoolError(msg)
+
+        # Serialize the worker callable once per map, rather than once per task,
+        # and only ship it to workers that don't already have it:
+        func_bytes = self._serializer.dumps_function(worker)
+
+        # One entry per free task slot, so each worker appears up to
+        # ``prefetch`` times. Workers are interleaved so that every worker gets
+        # a task before any worker gets a second one:
+        free = deque(sorted(self.workers) * self.prefetch)
+        n_slots = self.size * self.prefetch
+        sendreqs = {}
+
+        # Chunks are sent with a tag that is reused once their results are back,
+        # as the tag of the first task of a large map wouldn't fit in an MPI
+        # tag. Keep the ID of the first task of each chunk in flight by tag:
+        taskids = {}
+        tag = -1
+
+        # With prefetching, keep the chunks that are in flight and the number of
+        # them per worker, so that queued chunks can be moved to idle workers
+        # ("stolen") towards the end of the map. Chunks that have been given
+        # back by a worker are sent out again before any new ones:
+        inflight = {}
+        queued = dict.fromkeys(self.workers, 0)
+        stealing = set()
+        requeue = deque()
+
+        # Guided chunk sizes need the number of tasks, if it is known:
+        ntasks = operator.length_hint(tasks)
+        tasks = iter(tasks)
+        next_task = 0
+        exhausted = False
+
+        # Results of chunks that came back ahead of an earlier chunk, when
+        # yielding in order, and the number of chunks sent but not yet yielded:
+        done = {}
+        next_yield = 0
+        unyielded = 0
+
+        self._busy = True
+        try:
+            while True:
+                # Hand out as many chunks as there are free task slots:
+                while free and requeue:
+                    # Spread the chunks that were given back over the workers
+                    # with the least work:
+                    worker = min(free, key=queued.get)
+                    free.remove(worker)
+                    tag, chunk = requeue.popleft()
+                    self._send_chunk(worker, tag, chunk, func_bytes, sendreqs)
+                    inflight[tag] = chunk
+                    queued[worker] += 1
+
+                while (
+                    free
+                    and not exhausted
+                    and (lookahead is None or unyielded < lookahead)
+                ):
+                    # Sub-masters of hierarchical pools get chunks in proportion
+                    # to the number of workers in their group:
+                    worker = free.popleft()
+                    weight = self._weights[worker]
+                    if guided:
+                        # Each chunk gets a fraction of the remaining tasks, so
+                        # chunks get smaller towards the end of the map:
+                        n = -(-(ntasks - next_task) * weight // (2 * n_slots))
+                        n = max(n, 1)
+                    else:
+                        n = chunksize * weight
+
+                    chunk = list(itertools.islice(tasks, n))
+                    if len(chunk) < n:
+                        exhausted = True
+                    if not chunk:
+                        free.appendleft(worker)
+                        break
+
+                    tag = _next_tag(tag, taskids, self._tag_ub)
+                    taskids[tag] = next_task
+                    next_task += len(chunk)
+
+                    self._send_chunk(worker, tag, chunk, func_bytes, sendreqs)
+                    unyielded += 1
+                    if self.prefetch > 1:
+                        inflight[tag] = chunk
+                    queued[worker] += 1
+
+                if exhausted and self.prefetch > 1:
+                    for worker in _steal_victims(queued, stealing):
+                        self.comm.send(_Steal(), dest=worker, tag=0)
+                        stealing.add(worker)
+
+                if not sendreqs and not stealing:
+                    break
+
+                # ...then wait for a worker to reply before sending any more:
+                if block:
+                    self._wait_for_message()
+                else:
+                    while not self.comm.Iprobe(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG):
+                        yield None
+
+                status = MPI.Status()
+                results = self.comm.recv(
+                    source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=status
+                )
+                worker = status.source
+
+                if isinstance(results, _Released):
+                    stealing.discard(worker)
+                    for tag in results.tags:
+                        sendreqs.pop(tag).wait()
+                        requeue.append((tag, inflight.pop(tag)))
+                        queued[worker] -= 1
+                        free.append(worker)
+                    continue
+
+                # The worker has replied, so the send of this chunk has completed:
+                sendreqs.pop(status.tag).wait()
+                inflight.pop(status.tag, None)
+                taskid = taskids.pop(status.tag)
+                queued[worker] -= 1
+                free.append(worker)
+                if self._serialize_data:
+                    results = self._serializer.loads(results)
+
+                if not ordered:
+                    unyielded -= 1
+                    yield taskid, results
+                    continue
+
+                done[taskid] = results
+                while next_yield in done:
+                    results = done.pop(next_yield)
+                    unyielded -= 1
+                    yield next_yield, results
+                    next_yield += len(results)
+
+        finally:
+            # If the caller stopped early, collect the results of any chunks
+            # still out with the workers so they don't leak into the next map:
+            while sendreqs or stealing:
+                self._wait_for_message()
+                status = MPI.Status()
+                results = self.comm.recv(
+                    source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=status
+                )
+                if isinstance(results, _Released):
+                    stealing.discard(status.source)
+                    for tag in results.tags:
+                        sendreqs.pop(tag).wait()
+                else:
+                    sendreqs.pop(status.tag).wait()
+            self._busy = False
+
+    async def _adispatch(self, *args, **kwargs):
+        """Like :meth:`_dispatch`, but an asynchronous generator that hands
+        control back to the :mod:`asyncio` event loop while waiting for workers
+        to reply, backing off in the same way as :meth:`_wait_for_message`.
+        """
+        chunks = self._dispatch(*args, block=False, **kwargs)
+        try:
+            backoff = _Backoff(self.spin_time, self.max_poll_interval)
+            for chunk in chunks:
+                if chunk is None:
+                    # Even while spinning, let other tasks run:
+                    await asyncio.sleep(backoff.next())
+                    continue
+
+                backoff.reset()
+                yield chunk
+        finally:
+            chunks.close()
+
+    def _send_chunk(self, worker, tag, chunk, func_bytes, sendreqs):
+        # Only send the callable if the worker doesn't already have it:
+        send_func = self._worker_funcs.get(worker) != func_bytes
+        if self._serialize_data:
+            chunk = self._serializer.dumps(chunk)
+        task = (func_bytes if send_func else None, chunk)
+
+        # The worker may still be busy with earlier tasks, so don't block on the
+        # send:
+        sendreqs[tag] = self.comm.isend(task, dest=worker, tag=tag)
+        if send_func:
+            self._worker_funcs[worker] = func_bytes
+
+    def submit(self, fn, /, *args, **kwargs):
+        """Schedule ``fn(*args, **kwargs)`` to be run on a worker.
+
+        Returns a :class:`concurrent.futures.Future` right away, so that
+        dependent tasks can be submitted as soon as their inputs are ready, and
+        futures can be waited on with :func:`concurrent.futures.as_completed`
+        or :func:`concurrent.futures.wait`. Exceptions raised by ``fn`` are
+        raised again by the future's ``result()``.
+
+        Calls are sent to the workers, and their results received, by a thread
+        on the master process that runs while there are calls in progress. This
+        requires an MPI library that supports at least ``MPI_THREAD_SERIALIZED``
+        (``mpi4py`` asks for ``MPI_THREAD_MULTIPLE`` by default). Calling
+        ``map()`` while submitted calls are in progress raises a
+        :class:`~schwimmbad.error.PoolError`, and vice versa. On the workers,
+        this waits for instructions from the master, like :meth:`MPIPool.map`.
+
+        Parameters
+        ----------
+        fn : callable
+            A picklable function or callable object.
+        *args, **kwargs
+            The (picklable) arguments to call ``fn`` with.
+
+        Returns
+        -------
+        future : :class:`concurrent.futures.Future`
+        """
+        if not self.is_master():
+            self.wait()
+            return None
+
+        if MPI.Query_thread() < MPI.THREAD_SERIALIZED:
+            msg = "submit() requires an MPI library initialized with thread support"
+            raise PoolError(msg)
+
+        future = concurrent.futures.Future()
+        with self._calls_lock:
+            if self._busy and self._calls_thread is None:
+                msg = "Can't submit calls while a map on this pool is in progress"
+                raise PoolError(msg)
+
+            self._calls.append((future, (fn, args, kwargs)))
+            if self._calls_thread is None:
+                self._busy = True
+                self._calls_thread = threading.Thread(
+                    target=self._run_calls, name="schwimmbad-submit", daemon=True
+                )
+                self._calls_thread.start()
+
+        return future
+
+    def _run_calls(self):
+        """Send out the calls made with :meth:`submit` and resolve their futures
+        as the results come back, until there are none left.
+        """
+        func_bytes = self._serializer.dumps_function(_apply)
+        free = deque(sorted(self.workers) * self.prefetch)
+        futures = {}
+        tag = -1
+        sendreqs = {}
+        status = MPI.Status()
+        backoff = _Backoff(self.spin_time, self.max_poll_interval)
+
+        try:
+            while True:
+                with self._calls_lock:
+                    while free and self._calls:
+                        future, call = self._calls.popleft()
+                        if not future.set_running_or_notify_cancel():
+                            continue
+
+                        tag = _next_tag(tag, futures, self._tag_ub)
+                        try:
+                            self._send_chunk(free[0], tag, [call], func_bytes, sendreqs)
+                        except Exception as exc:
+                            # E.g., the arguments can't be pickled:
+                            future.set_exception(exc)
+                            continue
+                        futures[tag] = future
+                        free.popleft()
+
+                    if not sendreqs:
+                        self._calls_thread = None
+                        self._busy = False
+                        return
+
+                if not self.comm.Iprobe(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG):
+                    delay = backoff.next()
+                    if delay:
+                        time.sleep(delay)
+                    continue
+                backoff.reset()
+
+                results = self.comm.recv(
+                    source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=status
+                )
+                if self._serialize_data:
+                    results = self._serializer.loads(results)
+                (result,) = results
+                sendreqs.pop(status.tag).wait()
+                free.append(status.source)
+
+                future = futures.pop(status.tag)
+                success, value, tb = result
+                if success:
+                    future.set_result(value)
+                else:
+                    value.__cause__ = _RemoteTraceback(tb)
+                    future.set_exception(value)
+
+        except BaseException as exc:
+            # Don't leave anyone waiting on a future that will never complete:
+            with self._calls_lock:
+                pending = list(futures.values())
+                pending.extend(future for future, _ in self._calls)
+                self._calls.clear()
+                self._calls_thread = None
+            for future in pending:
+                if not future.done():
+                    future.set_exception(exc)
+            raise
+
+    def map(
+        self,
+        worker,
+        tasks,
+        callback=None,
+        return_results=True,
+        chunksize=1,
+        cost=None,
+        checkpoint=None,
+        batch_callback=None,
+    ):
         """Evaluate a function or callable on each task in parallel using MPI.
 
         The callable, ``worker``, is called on each element of the ``tasks``
@@ -154,6 +1018,42 @@ class MPIPool(BasePool):
             usage in the parallel calculations when large results are returned. This is
             useful if you need to call a callback function on each result and don't need
             to store the results in memory.
+        chunksize : int or str, optional
+            The number of tasks to send to a worker in each MPI message. Sending
+            tasks in chunks amortizes the per-message overhead when there are
+            many short tasks. If ``"guided"``, the chunk size adapts as the map
+            progresses (guided self-scheduling): chunks start large and shrink
+            towards the end of the map, so that no worker is left with a large
+            chunk once the others have run out of work. This requires the number
+            of tasks to be known (e.g., ``tasks`` is a list), otherwise chunks of
+            one task are sent. Default is 1.
+        cost : callable or sequence, optional
+            The expected cost (e.g., run time) of each task: either a function
+            that is called on each task on the master process, or a sequence
+            with one number per task (e.g., timings from a previous run). If
+            specified, tasks are sent out from the most to the least expensive,
+            so that the longest tasks don't end up being started last, and the
+            results are still returned in the same order as ``tasks``. This is
+            best combined with ``chunksize=1``, so that the most expensive tasks
+            aren't sent to the same worker.
+        checkpoint : str, path-like, or :class:`~schwimmbad.checkpoint.Journal`, optional
+            A journal file to checkpoint the map to. Each result is appended to
+            the journal, along with the index of its task, as it arrives on the
+            master, and the file is synced to disk at most once per second (see
+            :class:`~schwimmbad.checkpoint.Journal`). If the journal already
+            exists, e.g., because a previous run of the same map was killed,
+            the tasks it has results for are skipped, and their results are
+            read from the journal instead. ``callback`` is only called with the
+            new results. The tasks must be the same, and in the same order, as
+            in the run that wrote the journal. If ``cost`` is also specified,
+            the remaining tasks are sent out in order of decreasing cost.
+        batch_callback : callable or :class:`~schwimmbad.callbacks.BatchCallback`, optional
+            A function that is called with lists of results, on a separate
+            thread on the master process, so that it doesn't hold up sending out
+            tasks. By default, results are passed on in batches of up to 1000,
+            or after at most a second; pass a
+            :class:`~schwimmbad.callbacks.BatchCallback` to change this. All
+            results have been passed to ``batch_callback`` when this returns.
 
         Returns
         -------
@@ -167,50 +1067,188 @@ class MPIPool(BasePool):
             self.wait()
             return None
 
-        if callback is None:
-            callback = _dummy_callback
-
-        workerset = self.workers.copy()
-        tasklist = [(tid, (worker, arg)) for tid, arg in enumerate(tasks)]
-        resultlist = [None] * len(tasklist)
-        pending = len(tasklist)
+        if batch_callback is not None:
+            if not isinstance(batch_callback, BatchCallback):
+                batch_callback = BatchCallback(batch_callback)
+            with batch_callback:
+                return self.map(
+                    worker,
+                    tasks,
+                    _chain(callback, batch_callback),
+                    return_results,
+                    chunksize,
+                    cost,
+                    checkpoint,
+                )
 
-        while pending:
-            if workerset and tasklist:
-                worker = workerset.pop()
-                taskid, task = tasklist.pop()
-
-                self.comm.send(task, dest=worker, tag=taskid)
+        if checkpoint is not None:
+            return self._map_with_checkpoint(
+                functools.partial(self.imap_unordered, chunksize=chunksize),
+                worker,
+                tasks,
+                checkpoint,
+                callback,
+                return_results,
+                cost,
+            )
 
-            if tasklist:
-                flag = self.comm.Iprobe(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG)
-                if not flag:
-                    continue
-            else:
-                self.comm.Probe(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG)
+        if cost is not None:
+            return self._map_by_cost(
+                lambda tasks: self.map(
+                    worker, tasks, callback, return_results, chunksize
+                ),
+                tasks,
+                cost,
+            )
 
-            status = MPI.Status()
-            result = self.comm.recv(
-                source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=status
+        if self._collecting_stats(worker):
+            return self._map_with_stats(
+                lambda worker, tasks, callback: self.map(
+                    worker, tasks, callback, False, chunksize
+                ),
+                worker,
+                tasks,
+                callback,
+                return_results,
             )
-            worker = status.source
-            taskid = status.tag
 
-            callback(result)
+        if callback is None:
+            callback = _dummy_callback
+
+        resultlist = [None] * operator.length_hint(tasks)
+        for taskid, results in self._dispatch(worker, tasks, chunksize=chunksize):
+            for result in results:
+                callback(result)
 
-            workerset.add(worker)
             if return_results:
-                resultlist[taskid] = result
-            pending -= 1
+                _store_results(resultlist, taskid, results)
 
         if return_results:
             return resultlist
         return None
 
+    async def amap(self, worker, tasks, callback=None, chunksize=1):
+        """Like :meth:`MPIPool.map`, but can be awaited from an :mod:`asyncio`
+        event loop on the master process.
+
+        While waiting for the workers, the master checks for results without
+        blocking, handing control back to the event loop in between (see
+        ``spin_time`` and ``max_poll_interval``). Only one map can run on the pool at a time, so
+        concurrent calls raise a :class:`~schwimmbad.error.PoolError`. On the
+        workers, this waits for instructions from the master, like
+        :meth:`MPIPool.map`.
+        """
+        if not self.is_master():
+            self.wait()
+            return None
+
+        resultlist = [None] * operator.length_hint(tasks)
+        async for taskid, results in self._adispatch(
+            worker, tasks, chunksize=chunksize
+        ):
+            for result in results:
+                if callback is not None:
+                    callback(result)
+            _store_results(resultlist, taskid, results)
+
+        return resultlist
+
+    async def aimap_unordered(
+        self, worker, tasks, callback=None, chunksize=1, lookahead=None
+    ):
+        """Like :meth:`MPIPool.imap_unordered`, but an asynchronous iterator for
+        use with ``async for`` in an :mod:`asyncio` event loop on the master
+        process. See :meth:`MPIPool.amap`.
+        """
+        if not self.is_master():
+            self.wait()
+            return
+
+        if lookahead is None:
+            lookahead = 2 * len(self.workers) * self.prefetch
+
+        chunks = self._adispatch(
+            worker, tasks, chunksize=chunksize, lookahead=lookahead
+        )
+        try:
+            async for _, results in chunks:
+                for result in results:
+                    if callback is not None:
+                        callback(result)
+                    yield result
+        finally:
+            await chunks.aclose()
+
+    def imap(self, worker, tasks, callback=None, chunksize=1, lookahead=None):
+        """Lazily evaluate a function or callable on each task in parallel using
+        MPI, yielding the results in the same order as ``tasks``.
+
+        Unlike :meth:`MPIPool.map`, tasks are only pulled from ``tasks`` as
+        workers become available, so this can be used to stream through a very
+        large (or infinite) iterable or generator of tasks without holding all
+        of the tasks or results in memory.
+
+        Parameters
+        ----------
+        worker : callable
+            A function or callable object that is executed on each element of
+            the specified ``tasks`` iterable. This object must be picklable
+            (i.e. it can't be a function scoped within a function or a
+            ``lambda`` function). This should accept a single positional
+            argument and return a single object.
+        tasks : iterable
+            A list or iterable of tasks. Each task can be itself an iterable
+            (e.g., tuple) of values or data to pass in to the worker function.
+        callback : callable, optional
+            An optional callback function (or callable) that is called with each
+            result, on the master process, as it is yielded.
+        chunksize : int or str, optional
+            The number of tasks to send to a worker in each MPI message. See
+            :meth:`MPIPool.map`.
+        lookahead : int, optional
+            The maximum number of chunks taken from ``tasks`` whose results have
+            not yet been yielded. By default, this is twice the number of
+            chunks that can be in flight at once.
+
+        Returns
+        -------
+        results : generator
+        """
+        return self._imap(worker, tasks, callback, chunksize, lookahead, True)
+
+    def imap_unordered(self, worker, tasks, callback=None, chunksize=1, lookahead=None):
+        """Like :meth:`MPIPool.imap`, but results are yielded in the order they
+        are completed by the workers rather than in the order of ``tasks``.
+        """
+        return self._imap(worker, tasks, callback, chunksize, lookahead, False)
+
+    def _imap(self, worker, tasks, callback, chunksize, lookahead, ordered):
+        # If not the master just wait for instructions.
+        if not self.is_master():
+            self.wait()
+            return iter(())
+
+        if lookahead is None:
+            lookahead = 2 * len(self.workers) * self.prefetch
+
+        chunks = self._dispatch(
+            worker, tasks, chunksize=chunksize, lookahead=lookahead, ordered=ordered
+        )
+        results = itertools.chain.from_iterable(results for _, results in chunks)
+        return self._call_callback(callback, results)
+
     def close(self):
         """Tell all the workers to quit."""
         if self.is_worker():
             return
 
+        # Let any calls made with submit() finish first:
+        thread = self._calls_thread
+        if thread is not None:
+            thread.join()
+
+        while self._shared:
+            self.release(self._shared[-1])
+
         for worker in self.workers:
             self.comm.send(None, worker, 0)
@@ -1,35 +1,69 @@
 # type: ignore
+import asyncio
+import concurrent.futures
 import functools
+import importlib
+import itertools
+import queue
 import signal
+from collections import deque
 
 import multiprocess
+from multiprocess import resource_tracker
 from multiprocess.pool import Pool
 
+from .callbacks import BatchCallback, _chain
+from .pool import BasePool
+from .serializers import get_serializer
+from .shared import SharedMemoryData, release
+
 __all__ = ["MultiPool"]
 
 
-def _initializer_wrapper(actual_initializer, *rest):
+def _initializer_wrapper(actual_initializer, preload, *rest):
     """
     We ignore SIGINT. It's up to our parent to kill us in the typical
     condition of this arising from ``^C`` on a terminal. If someone is
     manually killing us with that signal, well... nothing will happen.
 
+    Modules in ``preload`` that the worker didn't inherit (e.g., with the
+    ``"spawn"`` start method) are imported before the first task.
+
     """
     signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for name in preload:
+        importlib.import_module(name)
     if actual_initializer is not None:
         actual_initializer(*rest)
 
 
-class CallbackWrapper:
-    def __init__(self, callback):
-        self.callback = callback
+def _map_serialized_chunk(serializer, func_bytes, payload):
+    """Run the serialized worker function on a serialized chunk of tasks, and
+    return the serialized list of results.
+    """
+    func = serializer.loads_function(func_bytes)
+    return serializer.dumps([func(x) for x in serializer.loads(payload)])
+
+
+def _call_soon(loop, func, *args):
+    # Called from the pool's result handler thread, so hand over to the event
+    # loop. If the loop has been closed in the meantime, the result is unwanted:
+    try:
+        loop.call_soon_threadsafe(func, *args)
+    except RuntimeError:
+        pass
+
 
-    def __call__(self, tasks):
-        for task in tasks:
-            self.callback(task)
+def _set_future(future, success, value):
+    if future.done():
+        return
+    if success:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
 
 
-class MultiPool(Pool):
+class MultiPool(Pool, BasePool):
     """
     A modified version of :class:`multiprocess.pool.Pool` that has better
     behavior with regard to ``KeyboardInterrupts`` in the :func:`map` method.
@@ -48,6 +82,39 @@ class MultiPool(Pool):
     initargs : iterable, optional
         Arguments for ``initializer``; it will be called as
         ``initializer(*initargs)``.
+    serializer : str or :class:`~schwimmbad.serializers.Serializer`, optional
+        How to serialize tasks and results: ``"pickle"`` (the default),
+        ``"dill"``, ``"cloudpickle"`` or ``"msgpack"``, or a
+        :class:`~schwimmbad.serializers.Serializer` (see
+        :func:`~schwimmbad.serializers.get_serializer`). With the default, the
+        worker function is serialized once per map with ``dill``, and chunks of
+        tasks and results are serialized with the (much faster) standard
+        library :mod:`pickle`, falling back to ``dill`` only when ``pickle``
+        fails. This applies to ``map()``, ``imap()``, ``imap_unordered()``, and
+        their asynchronous versions; other methods inherited from
+        :class:`multiprocess.pool.Pool` use ``dill`` as before.
+    compression : bool, str or :class:`~schwimmbad.compression.Compressor`, optional
+        Compress serialized chunks of tasks and results that are larger than
+        64 KiB, as long as they compress well: ``True`` for the fastest
+        available codec, the name of a codec (``"zlib"``, ``"lz4"`` or
+        ``"zstd"``), or a :class:`~schwimmbad.compression.Compressor` to set the
+        threshold and other options. Default is ``None``, for no compression.
+    start_method : str, optional
+        How to start the worker processes: ``"fork"``, ``"spawn"`` or
+        ``"forkserver"`` (see :ref:`multiprocessing-start-methods`). Defaults to
+        the default start method of :mod:`multiprocess`.
+    preload : list of str, optional
+        Names of modules (e.g., ``["numpy", "scipy.stats", "mymodel"]``) that
+        the workers should import before running any tasks. With the
+        ``"forkserver"`` start method, the modules are imported once, by the
+        fork server, and every worker of every pool that is created afterwards
+        is forked from it with the modules already imported, so creating a
+        pool takes milliseconds even if importing the modules takes seconds.
+        With ``"fork"``, they are imported by this process before the workers
+        are started, and with ``"spawn"``, by each worker when it starts. Note
+        that the fork server is started once per process, by the first pool
+        that uses it: modules that it didn't preload are imported by each
+        worker instead.
     kwargs:
         Extra arguments passed to the :class:`multiprocess.pool.Pool` superclass.
 
@@ -55,16 +122,70 @@ class MultiPool(Pool):
 
     wait_timeout = 3600
 
-    def __init__(self, processes=None, initializer=None, initargs=(), **kwargs):
-        new_initializer = functools.partial(_initializer_wrapper, initializer)
+    def __init__(
+        self,
+        processes=None,
+        initializer=None,
+        initargs=(),
+        serializer=None,
+        compression=None,
+        start_method=None,
+        preload=None,
+        **kwargs,
+    ):
+        self._serializer = get_serializer(serializer, compression)
+
+        if start_method is not None:
+            if kwargs.get("context") is not None:
+                msg = "Only one of start_method and context can be specified"
+                raise ValueError(msg)
+            kwargs["context"] = multiprocess.get_context(start_method)
+
+        preload = list(preload or [])
+        if preload:
+            self._preload(kwargs.get("context") or multiprocess.get_context(), preload)
+
+        # Shared memory blocks created with share(), released on close:
+        self._shared = []
+
+        # Start the resource tracker before the workers, so that they all use
+        # the same one: otherwise, shared memory blocks that the workers attach
+        # to get unlinked as "leaked" when the first worker exits.
+        resource_tracker.ensure_running()
+
+        new_initializer = functools.partial(_initializer_wrapper, initializer, preload)
         super().__init__(processes, new_initializer, initargs, **kwargs)
         self.size = self._processes
+        self.rank = 0
 
     @staticmethod
     def enabled():
         return True
 
-    def map(self, func, iterable, chunksize=None, callback=None):
+    @staticmethod
+    def _preload(context, modules):
+        """Import ``modules`` where the workers started with ``context`` will
+        inherit them.
+        """
+        method = context.get_start_method()
+        if method == "forkserver":
+            # This only has an effect if the fork server isn't running yet.
+            # Workers also need this module to unpickle their initializer:
+            context.set_forkserver_preload(["__main__", __name__, *modules])
+        elif method == "fork":
+            for name in modules:
+                importlib.import_module(name)
+
+    def map(
+        self,
+        func,
+        iterable,
+        chunksize=None,
+        callback=None,
+        cost=None,
+        checkpoint=None,
+        batch_callback=None,
+    ):
         """
         Equivalent to the built-in ``map()`` function and
         :meth:`multiprocessing.pool.Pool.map()`, without catching
@@ -86,6 +207,24 @@ class MultiPool(Pool):
             result from each worker run and is executed on the master process.
             This is useful for, e.g., saving results to a file, since the
             callback is only called on the master thread.
+        cost : callable or sequence, optional
+            The expected cost (e.g., run time) of each task: either a function
+            of the task, or a sequence with one number per task. If specified,
+            the most expensive tasks are started first, and the results are
+            still returned in the same order as ``tasks``. Tasks are then sent
+            to the workers one at a time unless ``chunksize`` is specified.
+        checkpoint : str, path-like, or :class:`~schwimmbad.checkpoint.Journal`, optional
+            A journal file that each result is appended to as it arrives, so
+            that an interrupted map can be resumed by calling it again with the
+            same tasks, in the same order, and the same journal: tasks that are
+            already in the journal are then skipped. See
+            :meth:`MPIPool.map <schwimmbad.MPIPool.map>` for details.
+        batch_callback : callable or :class:`~schwimmbad.callbacks.BatchCallback`, optional
+            A function that is called with lists of results on a separate
+            thread, as the results come in. Unlike ``callback``, which is only
+            called once the whole map has finished, this lets slow callbacks
+            (e.g., writing to a file) run while the workers are busy. See
+            :class:`~schwimmbad.callbacks.BatchCallback`.
 
         Returns
         -------
@@ -94,19 +233,330 @@ class MultiPool(Pool):
 
         """
 
-        callbackwrapper = CallbackWrapper(callback) if callback is not None else None
+        if batch_callback is not None:
+            if not isinstance(batch_callback, BatchCallback):
+                batch_callback = BatchCallback(batch_callback)
+            callback = _chain(callback, batch_callback)
+            with batch_callback:
+                if cost is not None or checkpoint is not None:
+                    return self.map(
+                        func, iterable, chunksize, callback, cost, checkpoint
+                    )
 
-        # The key magic is that we must call r.get() with a timeout, because
-        # a Condition.wait() without a timeout swallows KeyboardInterrupts.
-        r = self.map_async(
-            func, iterable, chunksize=chunksize, callback=callbackwrapper
+                # Unlike map_async(), imap() passes on results as chunks of
+                # tasks are completed:
+                if chunksize is None:
+                    iterable = list(iterable)
+                    chunksize = -(-len(iterable) // (4 * self._processes)) or 1
+                return list(self.imap(func, iterable, chunksize, callback))
+
+        if checkpoint is not None:
+            return self._map_with_checkpoint(
+                functools.partial(self.imap_unordered, chunksize=chunksize or 1),
+                func,
+                iterable,
+                checkpoint,
+                callback,
+                cost=cost,
+            )
+
+        if cost is not None:
+            return self._map_by_cost(
+                lambda tasks: self.map(func, tasks, chunksize or 1, callback),
+                iterable,
+                cost,
+            )
+
+        if self._collecting_stats(func):
+            # Record the results as the chunks arrive, rather than at the end
+            # of the map:
+            iterable = list(iterable)
+            if chunksize is None:
+                chunksize = -(-len(iterable) // (4 * self._processes)) or 1
+            return self._map_with_stats(
+                lambda func, tasks, callback: self.imap_unordered(
+                    func, tasks, chunksize, callback
+                ),
+                func,
+                iterable,
+                callback,
+            )
+
+        r = self.starmap_async(
+            _map_serialized_chunk,
+            self._serialize_chunks(func, iterable, chunksize),
+            chunksize=1,
         )
+        results = self._deserialize_chunks(self._get(r.get, multiprocess.TimeoutError))
+        if callback is not None:
+            for result in results:
+                callback(result)
+        return results
+
+    def imap(self, func, iterable, chunksize=1, callback=None, lookahead=None):
+        """
+        Lazily evaluate a function on each element of ``iterable``, yielding
+        the results in the same order as ``iterable``.
+
+        Unlike :meth:`multiprocessing.pool.Pool.imap`, which consumes the whole
+        input iterable up front, tasks are only pulled from ``iterable`` as
+        results are consumed, so this can be used to stream through a very large
+        generator of tasks without holding all of the tasks in memory.
+
+        Parameters
+        ----------
+        func : callable
+            A function or callable object that is executed on each element of
+            the specified ``iterable``.
+        iterable : iterable
+            A list or iterable of tasks.
+        chunksize : int, optional
+            The number of tasks sent to a worker process at a time.
+        callback : callable, optional
+            An optional callback function (or callable) that is called with each
+            result, on the master process, as it is yielded.
+        lookahead : int, optional
+            The maximum number of chunks taken from ``iterable`` whose results
+            have not yet been yielded. Defaults to twice the number of processes.
+
+        Returns
+        -------
+        results : generator
+
+        """
+        return self._call_callback(
+            callback, self._imap(func, iterable, chunksize, lookahead, True)
+        )
+
+    def imap_unordered(
+        self, func, iterable, chunksize=1, callback=None, lookahead=None
+    ):
+        """
+        Like :meth:`MultiPool.imap`, but results are yielded in the order they
+        are completed rather than in the order of ``iterable``.
+
+        """
+        return self._call_callback(
+            callback, self._imap(func, iterable, chunksize, lookahead, False)
+        )
+
+    def _serialize_chunks(self, func, iterable, chunksize):
+        """Split the tasks into chunks of ``chunksize`` (by default, about four
+        per process, like :meth:`multiprocessing.pool.Pool.map`) and return a
+        list of the arguments of :func:`_map_serialized_chunk` for each chunk.
+        """
+        tasks = list(iterable)
+        if chunksize is None:
+            chunksize = -(-len(tasks) // (4 * self._processes)) or 1
+
+        func_bytes = self._serializer.dumps_function(func)
+        return [
+            (
+                self._serializer,
+                func_bytes,
+                self._serializer.dumps(tasks[i : i + chunksize]),
+            )
+            for i in range(0, len(tasks), chunksize)
+        ]
+
+    def _deserialize_chunks(self, chunks):
+        """Deserialize the results of each chunk, and return them in one list."""
+        return [result for chunk in chunks for result in self._serializer.loads(chunk)]
+
+    def _imap(self, func, iterable, chunksize, lookahead, ordered):
+        if lookahead is None:
+            lookahead = 2 * self._processes
+
+        iterable = iter(iterable)
+        pending = deque()
+        done = queue.Queue()
+        func_bytes = self._serializer.dumps_function(func)
+
+        def submit():
+            chunk = list(itertools.islice(iterable, chunksize))
+            if not chunk:
+                return False
 
+            args = (self._serializer, func_bytes, self._serializer.dumps(chunk))
+            if ordered:
+                pending.append(self.apply_async(_map_serialized_chunk, args))
+            else:
+                pending.append(None)
+                self.apply_async(
+                    _map_serialized_chunk,
+                    args,
+                    callback=lambda res: done.put((True, res)),
+                    error_callback=lambda err: done.put((False, err)),
+                )
+            return True
+
+        while len(pending) < lookahead and submit():
+            pass
+
+        while pending:
+            r = pending.popleft()
+            if ordered:
+                results = self._get(r.get, multiprocess.TimeoutError)
+            else:
+                success, results = self._get(done.get, queue.Empty)
+                if not success:
+                    raise results
+
+            submit()
+            yield from self._serializer.loads(results)
+
+    def submit(self, fn, /, *args, **kwargs):
+        """
+        Schedule ``fn(*args, **kwargs)`` to be run in a worker process, and
+        return a :class:`concurrent.futures.Future` for the result.
+
+        The call is submitted with :meth:`~multiprocessing.pool.Pool.apply_async`
+        and the future is resolved by the pool's result handler thread, so it
+        can be waited on with :func:`concurrent.futures.as_completed` or
+        :func:`concurrent.futures.wait`. Submitted calls can't be cancelled.
+
+        """
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        self.apply_async(
+            fn,
+            args,
+            kwargs,
+            callback=future.set_result,
+            error_callback=future.set_exception,
+        )
+        return future
+
+    async def amap(self, func, iterable, chunksize=None, callback=None):
+        """
+        Like :meth:`MultiPool.map`, but can be awaited from an :mod:`asyncio`
+        event loop without blocking it.
+
+        The tasks are submitted with :meth:`~multiprocessing.pool.Pool.map_async`,
+        and the pool's result handler thread wakes up the event loop once all of
+        the results are in. Any ``callback`` is called on the thread running
+        the event loop.
+
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.starmap_async(
+            _map_serialized_chunk,
+            self._serialize_chunks(func, iterable, chunksize),
+            chunksize=1,
+            callback=functools.partial(_call_soon, loop, _set_future, future, True),
+            error_callback=functools.partial(
+                _call_soon, loop, _set_future, future, False
+            ),
+        )
+        results = self._deserialize_chunks(await future)
+        if callback is not None:
+            for result in results:
+                callback(result)
+        return results
+
+    async def aimap_unordered(
+        self, func, iterable, chunksize=1, callback=None, lookahead=None
+    ):
+        """
+        Like :meth:`MultiPool.imap_unordered`, but an asynchronous iterator for
+        use with ``async for`` in an :mod:`asyncio` event loop.
+
+        Results are handed over to the event loop by the pool's result handler
+        thread as each chunk of tasks completes, so the loop is never blocked.
+        Any ``callback`` is called on the thread running the event loop.
+
+        """
+        if lookahead is None:
+            lookahead = 2 * self._processes
+
+        loop = asyncio.get_running_loop()
+        iterable = iter(iterable)
+        done = asyncio.Queue()
+        func_bytes = self._serializer.dumps_function(func)
+
+        def put(success, value):
+            done.put_nowait((success, value))
+
+        def submit():
+            chunk = list(itertools.islice(iterable, chunksize))
+            if not chunk:
+                return False
+
+            self.apply_async(
+                _map_serialized_chunk,
+                (self._serializer, func_bytes, self._serializer.dumps(chunk)),
+                callback=functools.partial(_call_soon, loop, put, True),
+                error_callback=functools.partial(_call_soon, loop, put, False),
+            )
+            return True
+
+        n_pending = 0
+        while n_pending < lookahead and submit():
+            n_pending += 1
+
+        while n_pending:
+            success, results = await done.get()
+            n_pending -= 1
+            if not success:
+                raise results
+
+            if submit():
+                n_pending += 1
+
+            for result in self._serializer.loads(results):
+                if callback is not None:
+                    callback(result)
+                yield result
+
+    def share(self, data):
+        """
+        Share a large, read-only NumPy array or bytes-like object with the
+        worker processes.
+
+        The data is copied once into a shared memory block, and the returned
+        handle can be passed to the worker function in place of the data
+        (e.g., with :func:`functools.partial`). Pickling the handle only sends
+        the name of the memory block, and calling ``handle.get()`` in a worker
+        returns a zero-copy, read-only view of the data. The memory is freed
+        when the pool is closed or terminated.
+
+        Parameters
+        ----------
+        data : array-like or bytes-like
+            The data to share. Arrays must have a fixed-size data type.
+
+        Returns
+        -------
+        handle : :class:`~schwimmbad.shared.SharedMemoryData`
+
+        """
+        handle, shm = SharedMemoryData.create(data)
+        self._shared.append(shm)
+        return handle
+
+    def close(self):
+        super().close()
+        self._release_shared()
+
+    def terminate(self):
+        super().terminate()
+        self._release_shared()
+
+    def _release_shared(self):
+        # Unlinking only removes the names of the blocks, so workers that are
+        # still running tasks keep access to the memory:
+        while self._shared:
+            release(self._shared.pop())
+
+    def _get(self, get, timeout_error):
+        # The key magic is that we must call get() with a timeout, because
+        # a Condition.wait() without a timeout swallows KeyboardInterrupts.
         while True:
             try:
-                return r.get(self.wait_timeout)
+                return get(timeout=self.wait_timeout)
 
-            except multiprocess.TimeoutError:
+            except timeout_error:
                 pass
 
             except KeyboardInterrupt:
@@ -1,10 +1,16 @@
 # type: ignore
 import abc
-from collections.abc import Iterable
-from typing import Any, Callable
+import concurrent.futures
+from collections.abc import AsyncIterator, Iterable, Iterator
+from typing import Any, Callable, Optional
 
 # This package
-from .utils import batch_tasks
+from .checkpoint import Journal
+from .serializers import CompressedSerializer, Serializer, get_serializer
+from .shared import SharedData
+from .sinks import ResultSink
+from .stats import MapStats, _Recorder, _TimedWorker
+from .utils import _MemmapSlice, _OpenMemmapSlices, batch_tasks
 
 __all__ = ["BasePool"]
 
@@ -17,8 +23,59 @@ def _callback_wrapper(
         yield element
 
 
+class _Indexed:
+    """Wrap a worker so that it takes ``(index, task)`` pairs and returns
+    ``(index, result)`` pairs, to keep track of tasks with unordered maps.
+    """
+
+    def __init__(self, worker: Callable[..., Any]):
+        self.worker = worker
+
+    def __call__(self, item: tuple[int, Any]) -> tuple[int, Any]:
+        index, task = item
+        return index, self.worker(task)
+
+
+def _order_by_cost(tasks: Iterable[Any], cost: Any) -> tuple[list[Any], list[int]]:
+    """Return ``tasks`` as a list along with the indices of the tasks in order of
+    decreasing cost, where ``cost`` is either a function that returns the cost
+    of a task or a sequence of costs, one per task.
+    """
+    tasks = list(tasks)
+    costs = [cost(task) for task in tasks] if callable(cost) else list(cost)
+    if len(costs) != len(tasks):
+        msg = "cost must have one entry per task"
+        raise ValueError(msg)
+
+    # Sorting is stable, so tasks with equal costs stay in their input order:
+    order = sorted(range(len(tasks)), key=costs.__getitem__, reverse=True)
+    return tasks, order
+
+
 class BasePool(metaclass=abc.ABCMeta):
-    """A base class multiprocessing pool with a ``map`` method."""
+    """A base class multiprocessing pool with a ``map`` method.
+
+    Attributes
+    ----------
+    collect_stats : bool
+        If set to ``True``, ``map()`` records the timings of each task (how long
+        it waited for a worker, the time taken to serialize and deserialize it
+        and its result, and the time spent in the worker function), the sizes
+        of the serialized tasks and results, and which worker ran it. The tasks
+        and results are then serialized by the pool itself, with the pool's
+        serializer if it has one (see :mod:`schwimmbad.serializers`), which
+        adds some overhead. Maps with a ``checkpoint`` are not recorded.
+        Default is ``False``.
+    stats : :class:`~schwimmbad.stats.MapStats` or None
+        The timings of the last ``map()`` run while ``collect_stats`` was set.
+    """
+
+    collect_stats: bool = False
+    stats: Optional[MapStats] = None
+
+    # The serializer for tasks and results of pools that serialize them
+    # themselves, which is also used to record stats:
+    _serializer: Optional[Serializer] = None
 
     def __init__(self, **_: Any):
         self.rank = 0
@@ -40,15 +97,228 @@ class BasePool(metaclass=abc.ABCMeta):
     def map(self, *args: Any, **kwargs: Any) -> Any:
         return
 
+    def imap(
+        self,
+        worker: Callable[..., Any],
+        tasks: Iterable[Any],
+        callback: Optional[Callable[..., Any]] = None,
+    ) -> Iterator[Any]:
+        """Like ``map()``, but returns an iterator over the results, in the same
+        order as ``tasks``.
+
+        Pool classes override this to pull tasks lazily from ``tasks`` and to
+        yield results as they are completed. This default implementation just
+        iterates over the output of ``map()``.
+        """
+        return iter(self.map(worker, tasks, callback=callback))
+
+    def imap_unordered(
+        self,
+        worker: Callable[..., Any],
+        tasks: Iterable[Any],
+        callback: Optional[Callable[..., Any]] = None,
+    ) -> Iterator[Any]:
+        """Like :meth:`imap`, but the results may be yielded in any order."""
+        return self.imap(worker, tasks, callback=callback)
+
+    def submit(
+        self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any
+    ) -> concurrent.futures.Future:
+        """Schedule ``fn(*args, **kwargs)`` to be run by the pool, and return a
+        :class:`concurrent.futures.Future` for the result.
+
+        The futures can be waited on with :func:`concurrent.futures.as_completed`
+        or :func:`concurrent.futures.wait`. Pool classes that can run tasks in
+        the background override this. By default, ``fn`` is called right away,
+        and the returned future is already done.
+        """
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+        return future
+
+    async def amap(
+        self,
+        worker: Callable[..., Any],
+        tasks: Iterable[Any],
+        callback: Optional[Callable[..., Any]] = None,
+        **kwargs: Any,
+    ) -> Optional[list[Any]]:
+        """Like ``map()``, but can be awaited from an :mod:`asyncio` event loop
+        without blocking it.
+
+        Any ``callback`` is called on the thread running the event loop. Pool
+        classes override this to wait for results natively. This default
+        implementation runs ``map()`` in the event loop's default executor.
+        Other keyword arguments are passed on to ``map()``.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            None, lambda: list(self.map(worker, tasks, **kwargs))
+        )
+        if callback is not None:
+            for result in results:
+                callback(result)
+        return results
+
+    async def aimap_unordered(
+        self,
+        worker: Callable[..., Any],
+        tasks: Iterable[Any],
+        callback: Optional[Callable[..., Any]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Any]:
+        """Like :meth:`imap_unordered`, but returns an asynchronous iterator
+        over the results, for use with ``async for`` in an :mod:`asyncio` event
+        loop.
+
+        Any ``callback`` is called on the thread running the event loop. This
+        default implementation iterates over ``imap_unordered()`` in the event
+        loop's default executor. Other keyword arguments are passed on to
+        ``imap_unordered()``.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        results = iter(self.imap_unordered(worker, tasks, **kwargs))
+        done = object()
+        while True:
+            result = await loop.run_in_executor(None, next, results, done)
+            if result is done:
+                return
+            if callback is not None:
+                callback(result)
+            yield result
+
     def batched_map(
         self,
         worker: Callable[..., Any],
         tasks: Iterable[Any],
         *args: Any,
+        n_batches: Optional[int] = None,
+        costs: Optional[Iterable[float]] = None,
+        vectorize: bool = False,
         **kwargs: Any,
     ) -> Iterable[Any]:
-        batches = batch_tasks(n_batches=self.size, data=tasks)
-        return self.map(worker, batches, *args, **kwargs)
+        """Split ``tasks`` into batches with :func:`~schwimmbad.utils.batch_tasks`
+        and ``map()`` the ``worker`` over the batches.
+
+        Each call to ``worker`` receives a tuple ``((i1, i2), batch)``, where
+        ``batch`` is the list ``tasks[i1:i2]``, and the result is the list of
+        the return values of ``worker``, one per batch.
+
+        Parameters
+        ----------
+        worker : callable
+            A function or callable object that is executed on each batch.
+        tasks : iterable
+            The tasks to split into batches.
+        *args
+            Passed on to ``map()``.
+        n_batches : int, optional
+            The number of batches. Defaults to the size of the pool. Batches are
+            handed out to workers as they become free, so when task durations
+            vary a lot, using more batches than there are workers (e.g.,
+            ``n_batches=4 * pool.size``) evens out the load.
+        costs : iterable, optional
+            An estimate of the cost of each task. If specified, the batches are
+            cut to have roughly equal total cost rather than an equal number of
+            tasks.
+        vectorize : bool, optional
+            If ``True``, ``tasks`` is treated as a NumPy array (e.g., one row
+            per task) and each ``batch`` is a view of a range of rows, rather
+            than a list, so the tasks are never turned into Python objects. If
+            ``tasks`` is a :class:`numpy.memmap` of a whole file, workers are
+            only sent the location of their rows in the file, and map the rows
+            themselves. The worker should return an array for each batch, and
+            these are concatenated along the first axis into a single array,
+            which is returned instead of the list of results.
+        **kwargs
+            Passed on to ``map()``.
+        """
+        if n_batches is None:
+            n_batches = max(self.size, 1)
+        batches = batch_tasks(
+            n_batches=n_batches, data=tasks, costs=costs, vectorize=vectorize
+        )
+        if not vectorize:
+            return self.map(worker, batches, *args, **kwargs)
+
+        if _MemmapSlice.supported(tasks):
+            batches = [(idx, _MemmapSlice.from_rows(tasks, *idx)) for idx, _ in batches]
+            worker = _OpenMemmapSlices(worker)
+
+        results = self.map(worker, batches, *args, **kwargs)
+        if results is None:
+            # E.g., on the workers of an MPIPool
+            return None
+
+        import numpy as np
+
+        return np.concatenate(list(results))
+
+    def map_into(
+        self,
+        worker: Callable[..., Any],
+        tasks: Iterable[Any],
+        sink: ResultSink,
+        **kwargs: Any,
+    ) -> None:
+        """Map ``worker`` over ``tasks``, and store the results in ``sink`` as
+        they arrive rather than returning them in a list.
+
+        Results are yielded by ``imap_unordered()`` and added to the sink with
+        the index of their task, so with a :class:`~schwimmbad.sinks.ArraySink`
+        over a memory-mapped array or an HDF5 dataset, the output can be larger
+        than the memory of the master process. Tasks are pulled lazily from
+        ``tasks`` where the pool supports it.
+
+        Parameters
+        ----------
+        worker : callable
+            A function or callable object that is executed on each task.
+        tasks : iterable
+            A list or iterable of tasks.
+        sink : :class:`~schwimmbad.sinks.ResultSink`
+            Where to store the results. Any results still buffered by the sink
+            are written before this returns.
+        **kwargs
+            Passed on to ``imap_unordered()`` (e.g., ``chunksize``).
+        """
+        results = self.imap_unordered(_Indexed(worker), enumerate(tasks), **kwargs)
+        try:
+            for i, result in results:
+                sink.add(i, result)
+        finally:
+            sink.flush()
+
+    def share(self, data: Any) -> SharedData:
+        """Share large, read-only data with the workers of this pool.
+
+        Returns a handle that can be passed to the worker function in place of
+        the data (e.g., with :func:`functools.partial`), and that workers call
+        ``.get()`` on to access the data. Pool classes that can share memory
+        between processes override this so that the data is only stored once
+        and isn't pickled with every task; by default, the handle just holds on
+        to the data.
+
+        Parameters
+        ----------
+        data : array-like or bytes-like
+            The data to share.
+
+        Returns
+        -------
+        handle : :class:`~schwimmbad.shared.SharedData`
+        """
+        return SharedData(data)
 
     def close(self):
         pass
@@ -59,6 +329,124 @@ class BasePool(metaclass=abc.ABCMeta):
     def __exit__(self, *args):
         self.close()
 
+    def _map_by_cost(
+        self,
+        map_func: Callable[[list[Any]], Optional[list[Any]]],
+        tasks: Iterable[Any],
+        cost: Any,
+    ) -> Optional[list[Any]]:
+        """Call ``map_func`` on ``tasks`` sorted from most to least expensive
+        (the "longest processing time first" heuristic), then put the results
+        back in the same order as ``tasks``.
+        """
+        tasks, order = _order_by_cost(tasks, cost)
+        results = map_func([tasks[i] for i in order])
+        if results is None:
+            return None
+
+        resultlist = [None] * len(tasks)
+        for i, result in zip(order, results):
+            resultlist[i] = result
+        return resultlist
+
+    def _collecting_stats(self, worker: Callable[..., Any]) -> bool:
+        """Whether to record the timings of a ``map()`` of ``worker``, i.e.,
+        ``collect_stats`` is set and this isn't the inner call of
+        :meth:`_map_with_stats`.
+        """
+        return self.collect_stats and not isinstance(worker, _TimedWorker)
+
+    def _map_with_stats(
+        self,
+        map_func: Callable[..., Optional[Iterable[Any]]],
+        worker: Callable[..., Any],
+        tasks: Iterable[Any],
+        callback: Optional[Callable[..., Any]] = None,
+        return_results: bool = True,
+    ) -> Optional[list[Any]]:
+        """Call ``map_func(worker, tasks, callback)`` with a wrapped worker that
+        records its timings, serialized tasks, and a callback that deserializes
+        the results, and store the timings in ``self.stats``.
+        """
+        serializer = self._serializer or get_serializer()
+
+        # Compression happens when the pool sends the (serialized) tasks and
+        # results, so the recorded sizes are before compression, and the
+        # compressor's counters give the totals after compression:
+        compressor = None
+        if isinstance(serializer, CompressedSerializer):
+            compressor = serializer.compressor
+            serializer = serializer.serializer
+            before = compressor.counters()
+
+        recorder = _Recorder(self.size, serializer, callback, return_results)
+        results = map_func(
+            _TimedWorker(worker, serializer), recorder.encode(tasks), recorder.receive
+        )
+        if results is not None:
+            # Some maps are lazy, and only call the callback as the results
+            # are iterated over:
+            for _ in results:
+                pass
+        self.stats = recorder.finish()
+        if compressor is not None:
+            after = compressor.counters()
+            self.stats.compression = {k: after[k] - before[k] for k in after}
+
+        if not return_results:
+            return None
+        return [recorder.results[i] for i in range(len(recorder.results))]
+
+    def _map_with_checkpoint(
+        self,
+        imap_unordered: Callable[..., Iterable[Any]],
+        worker: Callable[..., Any],
+        tasks: Iterable[Any],
+        checkpoint: Any,
+        callback: Optional[Callable[..., Any]] = None,
+        return_results: bool = True,
+        cost: Any = None,
+    ) -> Optional[list[Any]]:
+        """Map ``worker`` over the tasks in ``tasks`` that aren't in the
+        ``checkpoint`` journal yet, using ``imap_unordered``, and add each result
+        to the journal as it arrives.
+
+        ``checkpoint`` is a path or a :class:`~schwimmbad.checkpoint.Journal`.
+        Tasks are identified by their index in ``tasks``. Results from the
+        journal are included in the returned list, but ``callback`` is only
+        called with new results. If ``cost`` is specified, the remaining tasks
+        are sent out from the most to the least expensive, as with
+        :meth:`_map_by_cost`.
+        """
+        if not isinstance(checkpoint, Journal):
+            checkpoint = Journal(checkpoint)
+
+        if cost is None:
+            tasks = list(tasks)
+            order = range(len(tasks))
+        else:
+            tasks, order = _order_by_cost(tasks, cost)
+
+        done = checkpoint.load()
+        resultlist = [None] * len(tasks) if return_results else None
+        pending = []
+        for i in order:
+            if i not in done:
+                pending.append((i, tasks[i]))
+            elif return_results:
+                resultlist[i] = done[i]
+        del done
+
+        with checkpoint:
+            for i, result in imap_unordered(_Indexed(worker), pending):
+                checkpoint.append(i, result)
+                if callback is not None:
+                    callback(result)
+                if return_results:
+                    resultlist[i] = result
+
+        return resultlist
+
     def _call_callback(self, callback, generator):
         if callback is None:
             return generator
@@ -21,7 +21,7 @@ class SerialPool(BasePool):
     def enabled():
         return True
 
-    def map(self, func, iterable, callback=None):
+    def map(self, func, iterable, callback=None, cost=None):
         """A wrapper around the built-in ``map()`` function to provide a
         consistent interface with the other ``Pool`` classes.
 
@@ -41,10 +41,36 @@ class SerialPool(BasePool):
             result from each worker run and is executed on the master process.
             This is useful for, e.g., saving results to a file, since the
             callback is only called on the master thread.
+        cost : callable or sequence, optional
+            The expected cost of each task: either a function of the task, or a
+            sequence with one number per task. If specified, tasks are evaluated
+            from the most to the least expensive, as with the other ``Pool``
+            classes, and a list of results in the same order as ``tasks`` is
+            returned.
 
         Returns
         -------
         results : generator
 
         """
+        if cost is not None:
+            return self._map_by_cost(
+                lambda tasks: self.map(func, tasks, callback), iterable, cost
+            )
+
+        if self._collecting_stats(func):
+            return self._map_with_stats(self.map, func, iterable, callback)
+
         return self._call_callback(callback, map(func, iterable))
+
+    def imap(self, func, iterable, callback=None):
+        """Equivalent to :meth:`SerialPool.map`: tasks are evaluated lazily, one
+        at a time, as the results are iterated over.
+        """
+        return self._call_callback(callback, map(func, iterable))
+
+    def imap_unordered(self, func, iterable, callback=None):
+        """Equivalent to :meth:`SerialPool.imap`: results are always yielded in
+        order.
+        """
+        return self.imap(func, iterable, callback=callback)
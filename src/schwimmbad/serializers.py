@@ -0,0 +1,261 @@
+# type: ignore
+"""
+Serializers that :class:`~schwimmbad.MultiPool` and :class:`~schwimmbad.MPIPool`
+use to send tasks, results and worker functions between processes (see the
+``serializer`` argument of the pools).
+"""
+
+__all__ = [
+    "CloudpickleSerializer",
+    "CompressedSerializer",
+    "DillSerializer",
+    "MsgpackNumpySerializer",
+    "PickleSerializer",
+    "Serializer",
+    "get_serializer",
+]
+
+import abc
+import pickle
+
+from .compression import Compressor
+
+# Marks the payloads that PickleSerializer pickled with dill. Pickles start with
+# the PROTO opcode (b"\x80"), so this can't be the first byte of the others:
+_dill_flag = b"D"
+
+# The most recently loaded worker function in this process, keyed by its
+# serialized form, so that workers only deserialize it once per map:
+_function_cache = {}
+
+
+class Serializer(metaclass=abc.ABCMeta):
+    """Base class for serializers.
+
+    Subclasses implement :meth:`dumps` and :meth:`loads` for tasks and
+    results. Worker functions are only serialized once per map, with
+    :meth:`dumps_function`, which uses ``dill`` by default so that lambdas,
+    closures and functions defined in ``__main__`` can be sent. Serializers are
+    pickled along with the tasks they serialize, so they should be cheap to
+    pickle.
+    """
+
+    @abc.abstractmethod
+    def dumps(self, obj):
+        """Serialize a task or result (or a list of them) to bytes."""
+
+    @abc.abstractmethod
+    def loads(self, data):
+        """Deserialize bytes returned by :meth:`dumps`."""
+
+    def dumps_function(self, func):
+        """Serialize a worker function or callable object to bytes."""
+        import dill
+
+        return dill.dumps(func, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads_function(self, data):
+        """Deserialize bytes returned by :meth:`dumps_function`."""
+        func = _function_cache.get(data)
+        if func is None:
+            import dill
+
+            func = dill.loads(data)
+            _function_cache.clear()
+            _function_cache[data] = func
+        return func
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class PickleSerializer(Serializer):
+    """Serialize tasks and results with the standard library :mod:`pickle`,
+    using protocol 5 (or higher), and fall back to ``dill`` for objects that
+    ``pickle`` can't handle (e.g., lambdas).
+
+    The C implementation of :mod:`pickle` is several times faster than
+    ``dill``, which pickles everything with the pure-Python pickler. Payloads
+    pickled with ``dill`` are marked, so that they are also unpickled with
+    ``dill`` (which is needed for, e.g., functions defined in ``__main__``).
+    This is the default serializer.
+
+    Parameters
+    ----------
+    fallback : bool, optional
+        Whether to serialize objects that ``pickle`` fails on with ``dill``.
+        Default is ``True``.
+    """
+
+    def __init__(self, fallback=True):
+        self.fallback = fallback
+
+    def dumps(self, obj):
+        try:
+            return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            if not self.fallback:
+                raise
+
+        import dill
+
+        return _dill_flag + dill.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data):
+        if data[:1] == _dill_flag:
+            import dill
+
+            return dill.loads(memoryview(data)[1:])
+        return pickle.loads(data)
+
+
+class DillSerializer(Serializer):
+    """Serialize tasks and results with ``dill``, which can serialize almost
+    any Python object, but is slower than :class:`PickleSerializer`.
+    """
+
+    def dumps(self, obj):
+        import dill
+
+        return dill.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data):
+        import dill
+
+        return dill.loads(data)
+
+
+class CloudpickleSerializer(Serializer):
+    """Serialize tasks, results and worker functions with ``cloudpickle``,
+    which, like ``dill``, pickles functions and classes defined in ``__main__``
+    by value. Requires ``cloudpickle``.
+    """
+
+    def __init__(self):
+        try:
+            import cloudpickle  # noqa: F401
+        except ImportError:
+            msg = "cloudpickle is required to use the CloudpickleSerializer"
+            raise ImportError(msg) from None
+
+    def dumps(self, obj):
+        import cloudpickle
+
+        return cloudpickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data):
+        return pickle.loads(data)
+
+    def dumps_function(self, func):
+        return self.dumps(func)
+
+
+class MsgpackNumpySerializer(Serializer):
+    """Serialize tasks and results with ``msgpack``, with ``msgpack-numpy`` to
+    support NumPy arrays.
+
+    This is fast and compact for numbers, strings, lists, dictionaries and
+    arrays, but can't serialize other objects, and tuples are deserialized as
+    lists. Worker functions are still serialized with ``dill``. Requires
+    ``msgpack`` and ``msgpack-numpy``.
+    """
+
+    def __init__(self):
+        try:
+            import msgpack  # noqa: F401
+            import msgpack_numpy  # noqa: F401
+        except ImportError:
+            msg = (
+                "msgpack and msgpack-numpy are required to use the "
+                "MsgpackNumpySerializer"
+            )
+            raise ImportError(msg) from None
+
+    def dumps(self, obj):
+        import msgpack
+        import msgpack_numpy
+
+        return msgpack.packb(obj, default=msgpack_numpy.encode)
+
+    def loads(self, data):
+        import msgpack
+        import msgpack_numpy
+
+        return msgpack.unpackb(
+            data, object_hook=msgpack_numpy.decode, strict_map_key=False
+        )
+
+
+class CompressedSerializer(Serializer):
+    """Wrap a serializer so that large serialized tasks and results are
+    compressed with a :class:`~schwimmbad.compression.Compressor`.
+
+    Parameters
+    ----------
+    serializer : :class:`Serializer`
+        The serializer to wrap.
+    compressor : :class:`~schwimmbad.compression.Compressor`, optional
+        The compressor, which defaults to ``Compressor()``.
+    """
+
+    def __init__(self, serializer, compressor=None):
+        self.serializer = serializer
+        self.compressor = Compressor() if compressor is None else compressor
+
+    def dumps(self, obj):
+        return self.compressor.compress(self.serializer.dumps(obj))
+
+    def loads(self, data):
+        return self.serializer.loads(self.compressor.decompress(data))
+
+    def dumps_function(self, func):
+        return self.serializer.dumps_function(func)
+
+    def loads_function(self, data):
+        return self.serializer.loads_function(data)
+
+    def __repr__(self):
+        return f"CompressedSerializer({self.serializer!r}, {self.compressor!r})"
+
+
+_serializers = {
+    "pickle": PickleSerializer,
+    "dill": DillSerializer,
+    "cloudpickle": CloudpickleSerializer,
+    "msgpack": MsgpackNumpySerializer,
+}
+
+
+def get_serializer(serializer=None, compression=None):
+    """Return a :class:`Serializer` instance.
+
+    Parameters
+    ----------
+    serializer : str or :class:`Serializer`, optional
+        One of ``"pickle"`` (the default, for ``None``), ``"dill"``,
+        ``"cloudpickle"`` or ``"msgpack"``, or a :class:`Serializer` instance,
+        which is used as is.
+    compression : bool, str or :class:`~schwimmbad.compression.Compressor`, optional
+        If specified, the serializer is wrapped in a
+        :class:`CompressedSerializer`. ``True`` uses the default
+        :class:`~schwimmbad.compression.Compressor`, and a string is the codec
+        to compress with (see :class:`~schwimmbad.compression.Compressor`).
+    """
+    if serializer is None:
+        serializer = "pickle"
+    if not isinstance(serializer, Serializer):
+        if serializer not in _serializers:
+            msg = (
+                f"Unknown serializer {serializer!r}; expected one of "
+                f"{', '.join(map(repr, _serializers))} or a Serializer instance"
+            )
+            raise ValueError(msg)
+        serializer = _serializers[serializer]()
+
+    if compression is None or compression is False:
+        return serializer
+    if compression is True:
+        compression = Compressor()
+    elif isinstance(compression, str):
+        compression = Compressor(compression)
+    return CompressedSerializer(serializer, compression)
@@ -0,0 +1,155 @@
+# type: ignore
+"""
+Handles to large, read-only data that is shared with the workers of a pool.
+
+Handles are created with the ``share()`` method of a pool and can be passed to
+the worker function like any other argument (e.g., bound with
+:func:`functools.partial` or stored on a callable object). They are cheap to
+pickle, so the data itself is not sent along with every task. Inside a worker,
+call ``handle.get()`` to access the data.
+"""
+
+__all__ = ["SharedData", "SharedMemoryData"]
+
+import functools
+
+# Shared memory blocks that have been created or attached to in this process,
+# keyed by name, so that each block is only mapped once per process:
+_attached = {}
+
+
+@functools.cache
+def _shared_memory_class():
+    from multiprocess.shared_memory import SharedMemory
+
+    class _SharedMemory(SharedMemory):
+        def __del__(self):
+            # Views of the data may outlive this object, in which case the
+            # memory is unmapped once they have been garbage collected:
+            try:
+                self.close()
+            except (OSError, BufferError):
+                pass
+
+    return _SharedMemory
+
+
+def _shared_memory(**kwargs):
+    return _shared_memory_class()(**kwargs)
+
+
+def _as_buffer(data):
+    """Return a contiguous byte view of ``data`` along with the ``shape`` and
+    ``dtype`` needed to reconstruct it (both ``None`` for bytes-like data).
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return memoryview(data).cast("B"), None, None
+
+    import numpy as np
+
+    arr = np.ascontiguousarray(data)
+    if arr.dtype.hasobject:
+        msg = "Only arrays with a fixed-size data type can be shared"
+        raise TypeError(msg)
+
+    return memoryview(arr.reshape(-1)).cast("B"), arr.shape, arr.dtype.str
+
+
+def _from_buffer(buf, shape, dtype):
+    buf = buf.toreadonly()
+    if dtype is None:
+        return buf
+
+    import numpy as np
+
+    return np.frombuffer(buf, dtype=dtype).reshape(shape)
+
+
+class SharedData:
+    """A handle to data shared with the workers of a pool.
+
+    This base class just holds on to the data, so the data is pickled along
+    with the handle. This is what pools without a more efficient way of sharing
+    data (e.g., :class:`~schwimmbad.SerialPool`) return from ``share()``.
+
+    Parameters
+    ----------
+    data : array-like or bytes-like
+        The data to share.
+    """
+
+    def __init__(self, data):
+        self._data = data
+
+    def get(self):
+        """Return the shared data."""
+        return self._data
+
+
+class SharedMemoryData(SharedData):
+    """A handle to a read-only array or bytes blob in a shared memory block.
+
+    Use :meth:`SharedMemoryData.create` to copy data into a new shared memory
+    block. Pickling the handle only sends the name of the block, and the data
+    is exposed to each process as a zero-copy, read-only view: a NumPy array
+    for array data and a :class:`memoryview` for bytes-like data.
+
+    Parameters
+    ----------
+    name : str
+        The name of the shared memory block.
+    nbytes : int
+        The size of the data in bytes.
+    shape : tuple, optional
+        The shape of the shared array, or ``None`` for bytes-like data.
+    dtype : str, optional
+        The data type of the shared array, or ``None`` for bytes-like data.
+    """
+
+    def __init__(self, name, nbytes, shape=None, dtype=None):
+        self.name = name
+        self.nbytes = nbytes
+        self.shape = shape
+        self.dtype = dtype
+
+    @classmethod
+    def create(cls, data):
+        """Copy ``data`` into a new shared memory block.
+
+        Returns
+        -------
+        handle : :class:`SharedMemoryData`
+            The handle to the shared data.
+        shm : :class:`multiprocess.shared_memory.SharedMemory`
+            The shared memory block, which the caller is responsible for
+            unlinking (see :func:`release`) once the data is no longer needed.
+        """
+        buf, shape, dtype = _as_buffer(data)
+        shm = _shared_memory(create=True, size=max(buf.nbytes, 1))
+        shm.buf[: buf.nbytes] = buf
+        _attached[shm.name] = shm
+
+        return cls(shm.name, buf.nbytes, shape, dtype), shm
+
+    def get(self):
+        """Return a read-only view of the shared data."""
+        shm = _attached.get(self.name)
+        if shm is None:
+            shm = _attached[self.name] = _shared_memory(name=self.name)
+
+        return _from_buffer(shm.buf[: self.nbytes], self.shape, self.dtype)
+
+
+def release(shm):
+    """Unlink a shared memory block created with
+    :meth:`SharedMemoryData.create`, so that it is freed once every process has
+    stopped using it.
+    """
+    _attached.pop(shm.name, None)
+    shm.unlink()
+    try:
+        shm.close()
+    except BufferError:
+        # Views of the data are still in use in this process, see
+        # _shared_memory_class() above
+        pass
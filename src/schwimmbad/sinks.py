@@ -0,0 +1,98 @@
+# type: ignore
+"""
+Result sinks, which store the results of a map as they arrive instead of
+collecting them in a list (see :meth:`BasePool.map_into
+<schwimmbad.pool.BasePool.map_into>`).
+"""
+
+__all__ = ["ArraySink", "ResultSink"]
+
+import abc
+
+
+class ResultSink(metaclass=abc.ABCMeta):
+    """Base class for result sinks.
+
+    Results are added one at a time, along with the index of their task, and
+    are buffered in memory. When the buffer is full, the buffered results are
+    sorted by index and handed to :meth:`write` in bulk, one call per run of
+    consecutive indices. Subclasses implement :meth:`write`.
+
+    Parameters
+    ----------
+    buffer_size : int, optional
+        The number of results to buffer before writing them. Default is 1024.
+    """
+
+    def __init__(self, buffer_size=1024):
+        if buffer_size < 1:
+            msg = "buffer_size must be >= 1"
+            raise ValueError(msg)
+        self.buffer_size = int(buffer_size)
+        self._buffer = {}
+
+    def add(self, index, result):
+        """Add the result of the task with the given index."""
+        self._buffer[index] = result
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write any buffered results."""
+        indices = sorted(self._buffer)
+        start = 0
+        for i in range(1, len(indices) + 1):
+            if i == len(indices) or indices[i] != indices[i - 1] + 1:
+                run = indices[start:i]
+                self.write(run[0], [self._buffer[j] for j in run])
+                start = i
+        self._buffer.clear()
+
+    @abc.abstractmethod
+    def write(self, start, results):
+        """Write the results of the tasks with indices ``start``,
+        ``start + 1``, ... ``start + len(results) - 1``.
+        """
+
+
+class ArraySink(ResultSink):
+    """A result sink that writes results into a preallocated array, with the
+    result of task ``i`` going to ``array[i]``.
+
+    Each run of consecutive results is written with a single slice assignment,
+    so any array-like object that supports that works: a NumPy array, a
+    :class:`numpy.memmap` (e.g., created with
+    :func:`numpy.lib.format.open_memmap` to write a ``.npy`` file), or an
+    ``h5py`` dataset. This way, the results never all have to fit in memory.
+
+    Parameters
+    ----------
+    array : array-like
+        The array to write into. Its first axis must have (at least) one entry
+        per task, and the remaining axes the shape of each result.
+    buffer_size : int, optional
+        The number of results to buffer before writing them. Default is 1024.
+
+    Examples
+    --------
+    ::
+
+        out = np.lib.format.open_memmap("results.npy", "w+", float, (len(tasks), 3))
+        pool.map_into(worker, tasks, ArraySink(out))
+
+    """
+
+    def __init__(self, array, buffer_size=1024):
+        super().__init__(buffer_size=buffer_size)
+        self.array = array
+
+    def write(self, start, results):
+        import numpy as np
+
+        self.array[start : start + len(results)] = np.asarray(results)
+
+    def flush(self):
+        super().flush()
+        if hasattr(self.array, "flush"):
+            # E.g., numpy.memmap and h5py datasets:
+            self.array.flush()
@@ -0,0 +1,395 @@
+# type: ignore
+"""
+Per-task timings of maps, to see where the time goes: in the master, in moving
+data between processes, or in the workers (see
+:attr:`BasePool.collect_stats <schwimmbad.pool.BasePool.collect_stats>`).
+"""
+
+__all__ = ["MapStats", "TaskStats"]
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+
+def _worker_name():
+    """A name for the current process and thread: the MPI rank if running
+    under MPI, and the host name and process ID otherwise.
+    """
+    MPI = sys.modules.get("mpi4py.MPI")
+    if MPI is not None and MPI.Is_initialized() and not MPI.Is_finalized():
+        name = f"rank {MPI.COMM_WORLD.Get_rank()}"
+    else:
+        name = f"{socket.gethostname()}:{os.getpid()}"
+
+    thread = threading.current_thread()
+    if thread is not threading.main_thread():
+        name = f"{name} ({thread.name})"
+    return name
+
+
+class TaskStats:
+    """The timings of a single task of a map.
+
+    Times are in seconds; ``submitted``, ``started``, ``finished`` and
+    ``received`` are timestamps from :func:`time.time`, so the clocks of the
+    hosts running the master and the workers are assumed to be synchronized.
+
+    Attributes
+    ----------
+    index : int
+        The index of the task.
+    worker : str
+        The worker that ran the task: its MPI rank or host name and process ID,
+        and the name of its thread unless it is the main thread.
+    pid, tid : int
+        The process ID and (native) thread ID of the worker.
+    submitted : float
+        When the serialized task was handed to the pool by the master.
+    started : float
+        When the worker started deserializing the task.
+    finished : float
+        When the worker finished serializing the result.
+    received : float
+        When the master started deserializing the result.
+    task_serialize_time, task_deserialize_time : float
+        The time taken to serialize the task on the master and to deserialize
+        it on the worker.
+    compute_time : float
+        The time spent in the worker function.
+    result_serialize_time, result_deserialize_time : float
+        The time taken to serialize the result on the worker and to
+        deserialize it on the master.
+    task_bytes, result_bytes : int
+        The size of the serialized task and result.
+    """
+
+    def __init__(self, index, submitted, task_serialize_time, task_bytes):
+        self.index = index
+        self.submitted = submitted
+        self.task_serialize_time = task_serialize_time
+        self.task_bytes = task_bytes
+
+        self.worker = None
+        self.pid = None
+        self.tid = None
+        self.started = None
+        self.finished = None
+        self.received = None
+        self.task_deserialize_time = None
+        self.compute_time = None
+        self.result_serialize_time = None
+        self.result_deserialize_time = None
+        self.result_bytes = None
+
+    @property
+    def queue_wait(self):
+        """The time between the task being handed to the pool and a worker
+        starting on it, which includes sending the task to the worker and
+        waiting for a free worker.
+        """
+        return self.started - self.submitted
+
+    @property
+    def result_wait(self):
+        """The time between the worker finishing the task and the master
+        receiving the result, which includes sending the result back.
+        """
+        return self.received - self.finished
+
+    def __repr__(self):
+        return f"<TaskStats index={self.index} worker={self.worker!r}>"
+
+
+class MapStats:
+    """The timings of all the tasks of a map.
+
+    Attributes
+    ----------
+    tasks : list of :class:`TaskStats`
+        The timings of each task, in the order of the tasks.
+    size : int
+        The number of workers in the pool.
+    start, end : float
+        When the map started and finished, as timestamps from
+        :func:`time.time`.
+    master_pid, master_tid : int
+        The process and thread ID that the map was called from.
+    compression : dict or None
+        If the pool compresses tasks and results, the
+        :meth:`~schwimmbad.compression.Compressor.counters` of the master for
+        the map, i.e., for the chunks of tasks it sent and of results it
+        received.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.tasks = []
+        self.compression = None
+        self.start = time.time()
+        self.end = None
+        self.master_pid = os.getpid()
+        self.master_tid = threading.get_native_id()
+
+    @property
+    def wall_time(self):
+        """The time from the start to the end of the map."""
+        return self.end - self.start
+
+    def workers(self):
+        """Return a dictionary of the total time that each worker spent on
+        tasks (deserializing, computing and serializing), keyed by worker name.
+        """
+        busy = {}
+        for task in self.tasks:
+            busy[task.worker] = busy.get(task.worker, 0.0) + (
+                task.finished - task.started
+            )
+        return busy
+
+    def summary(self):
+        """Return a dictionary of totals over all tasks.
+
+        ``master_time`` is the time the master spent serializing tasks and
+        deserializing results, ``compute_time`` and ``worker_overhead`` the
+        time the workers spent in the worker function and on serialization,
+        and ``transfer_time`` the time between the workers finishing tasks and
+        the master receiving the results (see :attr:`TaskStats.result_wait`),
+        which for pools that send tasks in chunks includes results waiting for
+        the rest of their chunk.
+        ``queue_wait`` is the time between tasks being handed to the pool and a
+        worker starting on them (see :attr:`TaskStats.queue_wait`), which is
+        reported separately because it is large whenever there are more tasks
+        than workers, as tasks wait for their turn. ``utilization`` is the
+        fraction of the wall time of the map that the workers spent in the
+        worker function. Comparing these shows whether a map is bound by the
+        master, by communication, or by computation.
+
+        If the pool compresses its messages, ``wire_bytes`` is the total size
+        of the messages after compression, ``compression_ratio`` is their size
+        relative to before compression, and ``compression_time`` is the time the
+        master spent compressing and decompressing them.
+        """
+        n_workers = self.size or len(self.workers()) or 1
+        compute = sum(task.compute_time for task in self.tasks)
+        summary = {
+            "n_tasks": len(self.tasks),
+            "n_workers": n_workers,
+            "wall_time": self.wall_time,
+            "master_time": sum(
+                task.task_serialize_time + task.result_deserialize_time
+                for task in self.tasks
+            ),
+            "transfer_time": sum(task.result_wait for task in self.tasks),
+            "queue_wait": sum(task.queue_wait for task in self.tasks),
+            "compute_time": compute,
+            "worker_overhead": sum(
+                task.task_deserialize_time + task.result_serialize_time
+                for task in self.tasks
+            ),
+            "task_bytes": sum(task.task_bytes for task in self.tasks),
+            "result_bytes": sum(task.result_bytes for task in self.tasks),
+            "utilization": (
+                compute / (self.wall_time * n_workers) if self.wall_time else 0.0
+            ),
+        }
+
+        if self.compression is not None:
+            counters = self.compression
+            summary["wire_bytes"] = counters["wire_bytes"]
+            summary["compression_ratio"] = (
+                counters["wire_bytes"] / counters["raw_bytes"]
+                if counters["raw_bytes"]
+                else 1.0
+            )
+            summary["compression_time"] = (
+                counters["compress_time"] + counters["decompress_time"]
+            )
+        return summary
+
+    def to_chrome_trace(self, path=None):
+        """Convert the timings to the Chrome trace event format, which can be
+        loaded in Perfetto (https://ui.perfetto.dev) or ``chrome://tracing``.
+
+        Each process and thread gets a track, with a slice for each step of
+        each task, labelled with the task index and payload sizes.
+
+        Parameters
+        ----------
+        path : str or path-like, optional
+            If specified, the trace is written to this file as JSON.
+
+        Returns
+        -------
+        trace : dict
+            The trace, which can be serialized with :func:`json.dump`.
+        """
+
+        def us(t):
+            return (t - self.start) * 1e6
+
+        events = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": self.master_pid,
+                "args": {"name": "master"},
+            }
+        ]
+        named = {self.master_pid}
+
+        for task in self.tasks:
+            args = {
+                "index": task.index,
+                "task_bytes": task.task_bytes,
+                "result_bytes": task.result_bytes,
+            }
+            if task.pid not in named:
+                named.add(task.pid)
+                events.append(
+                    {
+                        "name": "process_name",
+                        "ph": "M",
+                        "pid": task.pid,
+                        "args": {"name": task.worker.split(" (")[0]},
+                    }
+                )
+
+            master = (self.master_pid, self.master_tid)
+            steps = [
+                (
+                    "serialize task",
+                    master,
+                    task.submitted - task.task_serialize_time,
+                    task.task_serialize_time,
+                ),
+                (
+                    "deserialize task",
+                    (task.pid, task.tid),
+                    task.started,
+                    task.task_deserialize_time,
+                ),
+                (
+                    "compute",
+                    (task.pid, task.tid),
+                    task.started + task.task_deserialize_time,
+                    task.compute_time,
+                ),
+                (
+                    "serialize result",
+                    (task.pid, task.tid),
+                    task.finished - task.result_serialize_time,
+                    task.result_serialize_time,
+                ),
+                (
+                    "deserialize result",
+                    master,
+                    task.received,
+                    task.result_deserialize_time,
+                ),
+            ]
+            for name, (pid, tid), start, duration in steps:
+                events.append(
+                    {
+                        "name": name,
+                        "cat": "task",
+                        "ph": "X",
+                        "ts": us(start),
+                        "dur": duration * 1e6,
+                        "pid": pid,
+                        "tid": tid,
+                        "args": args,
+                    }
+                )
+
+        trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+        if path is not None:
+            with Path(path).open("w") as f:
+                json.dump(trace, f)
+        return trace
+
+    def __repr__(self):
+        return f"<MapStats n_tasks={len(self.tasks)} size={self.size}>"
+
+
+class _TimedWorker:
+    """Wrap a worker so that it takes serialized tasks from
+    :meth:`_Recorder.encode`, and returns serialized results along with the
+    timings of the task.
+    """
+
+    def __init__(self, worker, serializer):
+        self.worker = worker
+        self.serializer = serializer
+
+    def __call__(self, item):
+        index, payload = item
+        started = time.time()
+        t0 = time.perf_counter()
+        task = self.serializer.loads(payload)
+        t1 = time.perf_counter()
+        result = self.worker(task)
+        t2 = time.perf_counter()
+        payload = self.serializer.dumps(result)
+        t3 = time.perf_counter()
+
+        timings = {
+            "worker": _worker_name(),
+            "pid": os.getpid(),
+            "tid": threading.get_native_id(),
+            "started": started,
+            "finished": started + (t3 - t0),
+            "task_deserialize_time": t1 - t0,
+            "compute_time": t2 - t1,
+            "result_serialize_time": t3 - t2,
+        }
+        return index, payload, timings
+
+
+class _Recorder:
+    """Serialize the tasks of a map for a :class:`_TimedWorker`, and
+    deserialize the results, recording the timings in a :class:`MapStats`.
+    """
+
+    def __init__(self, size, serializer, callback=None, return_results=True):
+        self.stats = MapStats(size)
+        self.serializer = serializer
+        self.callback = callback
+        self.return_results = return_results
+        self.results = {}
+
+    def encode(self, tasks):
+        for index, task in enumerate(tasks):
+            t0 = time.perf_counter()
+            payload = self.serializer.dumps(task)
+            duration = time.perf_counter() - t0
+            self.stats.tasks.append(
+                TaskStats(index, time.time(), duration, len(payload))
+            )
+            yield index, payload
+
+    def receive(self, item):
+        index, payload, timings = item
+        received = time.time()
+        t0 = time.perf_counter()
+        result = self.serializer.loads(payload)
+
+        task = self.stats.tasks[index]
+        for name, value in timings.items():
+            setattr(task, name, value)
+        task.received = received
+        task.result_deserialize_time = time.perf_counter() - t0
+        task.result_bytes = len(payload)
+
+        if self.return_results:
+            self.results[index] = result
+        if self.callback is not None:
+            self.callback(result)
+
+    def finish(self):
+        self.stats.end = time.time()
+        return self.stats
@@ -0,0 +1,206 @@
+# type: ignore
+import concurrent.futures
+import itertools
+import os
+from collections import deque
+
+from .pool import BasePool
+
+__all__ = ["ThreadPool"]
+
+
+class ThreadPool(BasePool):
+    """A pool that evaluates tasks in threads of the current process, using
+    :class:`concurrent.futures.ThreadPoolExecutor`.
+
+    Tasks, results, and the worker function are passed to the threads directly,
+    without being pickled, and there are no processes to start. Threads only
+    run Python code one at a time (except on free-threaded builds of Python),
+    so this pool is best suited to tasks that spend most of their time in code
+    that releases the GIL, e.g., NumPy or BLAS routines, or I/O.
+
+    Parameters
+    ----------
+    threads : int, optional
+        The number of worker threads to use; defaults to the number of CPUs.
+    initializer : callable, optional
+        If specified, a callable that will be invoked by each worker thread
+        when it starts.
+    initargs : iterable, optional
+        Arguments for ``initializer``; it will be called as
+        ``initializer(*initargs)``.
+
+    """
+
+    def __init__(self, threads=None, initializer=None, initargs=()):
+        if threads is None:
+            threads = os.cpu_count() or 1
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=threads,
+            thread_name_prefix="schwimmbad",
+            initializer=initializer,
+            initargs=tuple(initargs),
+        )
+        self.size = threads
+        self.rank = 0
+
+    @staticmethod
+    def enabled():
+        return True
+
+    def map(self, func, iterable, callback=None, cost=None):
+        """Evaluate a function or callable on each element of ``iterable`` in
+        the worker threads.
+
+        Parameters
+        ----------
+        func : callable
+            A function or callable object that is executed on each element of
+            the specified ``iterable``. This should accept a single positional
+            argument and return a single object.
+        iterable : iterable
+            A list or iterable of tasks.
+        callback : callable, optional
+            An optional callback function (or callable) that is called with the
+            result from each worker run, on the thread that called ``map()``.
+        cost : callable or sequence, optional
+            The expected cost of each task: either a function of the task, or a
+            sequence with one number per task. If specified, the most expensive
+            tasks are started first, and the results are still returned in the
+            same order as ``iterable``.
+
+        Returns
+        -------
+        results : list
+            A list of results from the output of each ``func()`` call.
+
+        """
+        if cost is not None:
+            return self._map_by_cost(
+                lambda tasks: self.map(func, tasks, callback), iterable, cost
+            )
+
+        if self._collecting_stats(func):
+            # Record the results as they arrive, rather than in order:
+            return self._map_with_stats(self.imap_unordered, func, iterable, callback)
+
+        futures = [self._executor.submit(func, task) for task in iterable]
+        try:
+            results = []
+            for future in futures:
+                result = future.result()
+                if callback is not None:
+                    callback(result)
+                results.append(result)
+        finally:
+            # Don't start any more tasks if a task failed or if interrupted:
+            for future in futures:
+                future.cancel()
+
+        return results
+
+    def imap(self, func, iterable, callback=None, lookahead=None):
+        """Lazily evaluate a function on each element of ``iterable``, yielding
+        the results in the same order as ``iterable``.
+
+        Tasks are only pulled from ``iterable`` as results are consumed, so this
+        can be used to stream through a very large generator of tasks.
+
+        Parameters
+        ----------
+        func : callable
+            A function or callable object that is executed on each element of
+            the specified ``iterable``.
+        iterable : iterable
+            A list or iterable of tasks.
+        callback : callable, optional
+            An optional callback function (or callable) that is called with each
+            result as it is yielded.
+        lookahead : int, optional
+            The maximum number of tasks taken from ``iterable`` whose results
+            have not yet been yielded. Defaults to twice the number of threads.
+
+        Returns
+        -------
+        results : generator
+
+        """
+        return self._call_callback(callback, self._imap(func, iterable, lookahead))
+
+    def imap_unordered(self, func, iterable, callback=None, lookahead=None):
+        """Like :meth:`ThreadPool.imap`, but results are yielded in the order
+        they are completed rather than in the order of ``iterable``.
+        """
+        return self._call_callback(
+            callback, self._imap_unordered(func, iterable, lookahead)
+        )
+
+    def _imap(self, func, iterable, lookahead):
+        if lookahead is None:
+            lookahead = 2 * self.size
+
+        iterable = iter(iterable)
+        pending = deque(
+            self._executor.submit(func, task)
+            for task in itertools.islice(iterable, lookahead)
+        )
+        try:
+            while pending:
+                result = pending.popleft().result()
+                for task in itertools.islice(iterable, 1):
+                    pending.append(self._executor.submit(func, task))
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _imap_unordered(self, func, iterable, lookahead):
+        if lookahead is None:
+            lookahead = 2 * self.size
+
+        iterable = iter(iterable)
+        pending = {
+            self._executor.submit(func, task)
+            for task in itertools.islice(iterable, lookahead)
+        }
+        try:
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for task in itertools.islice(iterable, len(done)):
+                    pending.add(self._executor.submit(func, task))
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def submit(self, fn, /, *args, **kwargs):
+        """Schedule ``fn(*args, **kwargs)`` to be run in a worker thread, and
+        return a :class:`concurrent.futures.Future` for the result.
+        """
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def share(self, data):
+        """Share data with the worker threads.
+
+        Threads already share the memory of the process, so the returned
+        handle just holds on to ``data`` without copying it.
+
+        Parameters
+        ----------
+        data : array-like or bytes-like
+            The data to share.
+
+        Returns
+        -------
+        handle : :class:`~schwimmbad.shared.SharedData`
+
+        """
+        return super().share(data)
+
+    def close(self):
+        """Wait for any running tasks to finish and stop the worker threads."""
+        self._executor.shutdown(wait=True)
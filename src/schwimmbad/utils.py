@@ -1,6 +1,9 @@
 # type: ignore
 __all__ = ["batch_tasks"]
 
+import bisect
+import itertools
+import mmap
 
 from .decorators import deprecated_renamed_argument
 
@@ -13,6 +16,8 @@ def batch_tasks(
     args=(),
     start_idx=0,
     include_idx=True,
+    costs=None,
+    vectorize=False,
 ):
     """Split tasks into some number of batches to send out to workers.
 
@@ -37,6 +42,17 @@ def batch_tasks(
     include_idx : bool (optional)
         If passing an array in, this determines whether to include the indices
         of each batch with each task.
+    costs : iterable (optional)
+        An estimate of the cost (e.g., the run time) of each task. If specified,
+        the batches are cut so that they have roughly equal total cost instead
+        of an equal number of tasks. When task durations vary a lot, it also
+        helps to use more batches than there are workers (e.g.,
+        ``n_batches=4 * pool.size``): workers that finish early then pick up
+        the remaining batches, so no one batch holds up the whole map.
+    vectorize : bool (optional)
+        If ``True``, ``data`` is converted to a NumPy array (unless it already
+        is one) instead of a list, and each batch of data is a view of the rows
+        of the array, without copying them.
     """
     args = tuple(args)
 
@@ -44,7 +60,11 @@ def batch_tasks(
         msg = "you must pass one of n_tasks or data (not both)"
         raise ValueError(msg)
 
-    if data is not None:
+    if data is not None and vectorize:
+        import numpy as np
+
+        data = np.asanyarray(data)
+    elif data is not None:
         data = list(data)
 
     # Case where data is None is covered above
@@ -59,19 +79,32 @@ def batch_tasks(
         # TODO: add a warning?
         n_batches = n_tasks
 
-    # Chunk by the number of batches, often the pool size
-    base_batch_size = n_tasks // n_batches
-    rmdr = n_tasks % n_batches
-
-    i1 = start_idx
-    indices = []
-    for i in range(n_batches):
-        i2 = i1 + base_batch_size
-        if i < rmdr:
-            i2 += 1
-
-        indices.append((i1, i2))
-        i1 = i2
+    if costs is not None:
+        costs = list(costs)
+        if len(costs) != n_tasks:
+            msg = "costs must have one entry per task"
+            raise ValueError(msg)
+        if any(cost < 0 for cost in costs):
+            msg = "costs must be >= 0"
+            raise ValueError(msg)
+
+    if costs is not None and sum(costs) > 0:
+        indices = _cost_indices(n_batches, costs, start_idx)
+
+    else:
+        # Chunk by the number of batches, often the pool size
+        base_batch_size = n_tasks // n_batches
+        rmdr = n_tasks % n_batches
+
+        i1 = start_idx
+        indices = []
+        for i in range(n_batches):
+            i2 = i1 + base_batch_size
+            if i < rmdr:
+                i2 += 1
+
+            indices.append((i1, i2))
+            i1 = i2
 
     # Add args, possible slice input array:
     tasks = []
@@ -94,3 +127,85 @@ def batch_tasks(
             tasks.append(idx)
 
     return tasks
+
+
+def _cost_indices(n_batches, costs, start_idx=0):
+    """Split tasks with the given costs into ``n_batches`` contiguous, non-empty
+    index ranges with roughly equal total cost.
+    """
+    n_tasks = len(costs)
+    cumulative = list(itertools.accumulate(costs, initial=0))
+    total = cumulative[-1]
+
+    i1 = 0
+    indices = []
+    for k in range(1, n_batches):
+        # Cut at the task boundary closest to an equal share of the cost that is
+        # left, leaving at least one task for this batch and each of the ones
+        # after it:
+        target = cumulative[i1] + (total - cumulative[i1]) / (n_batches - k + 1)
+        i2 = bisect.bisect_left(cumulative, target)
+        if i2 > 0 and target - cumulative[i2 - 1] < cumulative[i2] - target:
+            i2 -= 1
+        i2 = min(max(i2, i1 + 1), n_tasks - (n_batches - k))
+
+        indices.append((start_idx + i1, start_idx + i2))
+        i1 = i2
+
+    indices.append((start_idx + i1, start_idx + n_tasks))
+    return indices
+
+
+class _MemmapSlice:
+    """The location of a range of rows of a memory-mapped array in its file, so
+    that workers can map the rows themselves instead of being sent the data.
+    """
+
+    def __init__(self, filename, offset, shape, dtype):
+        self.filename = filename
+        self.offset = offset
+        self.shape = shape
+        self.dtype = dtype
+
+    @classmethod
+    def from_rows(cls, arr, i1, i2):
+        return cls(
+            arr.filename,
+            arr.offset + i1 * arr.strides[0],
+            (i2 - i1, *arr.shape[1:]),
+            arr.dtype.str,
+        )
+
+    @staticmethod
+    def supported(arr):
+        """Whether the rows of ``arr`` can be sent as file offsets: ``arr`` has
+        to be a whole, C-contiguous array mapped from a file.
+        """
+        import numpy as np
+
+        return (
+            isinstance(arr, np.memmap)
+            and arr.filename is not None
+            and isinstance(arr.base, mmap.mmap)
+            and arr.flags.c_contiguous
+        )
+
+    def open(self):
+        import numpy as np
+
+        return np.memmap(
+            self.filename, self.dtype, "r", offset=self.offset, shape=self.shape
+        )
+
+
+class _OpenMemmapSlices:
+    """Wrap a worker for batches of the form ``((i1, i2), rows)`` so that it is
+    called with the rows memory-mapped from their :class:`_MemmapSlice`.
+    """
+
+    def __init__(self, worker):
+        self.worker = worker
+
+    def __call__(self, task):
+        idx, rows = task
+        return self.worker((idx, rows.open()))
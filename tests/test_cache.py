@@ -0,0 +1,123 @@
+# type: ignore
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from schwimmbad import CachedPool, MultiPool, SerialPool
+from schwimmbad.cache import _task_bytes, _worker_digest
+
+# Tasks evaluated by _logged_square() in this process:
+_calls = []
+
+
+def _logged_square(x):
+    _calls.append(x)
+    return x**2
+
+
+def _square(x):
+    return x**2
+
+
+def _cube(x):
+    return x**3
+
+
+def test_cached_map(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    _calls.clear()
+
+    with CachedPool(SerialPool(), path) as pool:
+        assert pool.map(_logged_square, range(10)) == [x**2 for x in range(10)]
+        assert _calls == list(range(10))
+
+    # only new tasks are evaluated, and the cache persists between pools:
+    _calls.clear()
+    mylist = []
+    with CachedPool(SerialPool(), path) as pool:
+        results = pool.map(_logged_square, range(12), callback=mylist.append)
+        assert results == [x**2 for x in range(12)]
+        assert _calls == [10, 11]
+        assert sorted(mylist) == results
+
+        pool.clear()
+        _calls.clear()
+        pool.map(_logged_square, range(3))
+        assert _calls == [0, 1, 2]
+
+
+def test_cached_map_multipool(tmp_path):
+    with CachedPool(MultiPool(processes=2), tmp_path / "cache.sqlite") as pool:
+        assert pool.map(_square, range(100)) == [x**2 for x in range(100)]
+        assert pool.map(_square, range(110)) == [x**2 for x in range(110)]
+
+        # a different worker doesn't get the results of another one:
+        assert pool.map(_cube, range(10)) == [x**3 for x in range(10)]
+
+
+def test_cache_eviction(tmp_path):
+    with CachedPool(SerialPool(), tmp_path / "cache.sqlite", max_bytes=200) as pool:
+        pool.map(_logged_square, range(100))
+        nbytes = pool._db.execute("SELECT SUM(nbytes) FROM results").fetchone()[0]
+        assert nbytes <= 200
+
+        # the most recently used results are kept:
+        _calls.clear()
+        pool.map(_logged_square, [0, 99])
+        assert _calls == [0]
+
+
+def test_worker_digest():
+    assert _worker_digest(_square) == _worker_digest(_square)
+    assert _worker_digest(_square) != _worker_digest(_cube)
+    assert _worker_digest(lambda x: x) != _worker_digest(lambda x: x + 1)
+
+
+def test_cached_amap(tmp_path):
+    # amap() runs map() on another thread:
+    _calls.clear()
+    with CachedPool(SerialPool(), tmp_path / "cache.sqlite") as pool:
+        results = asyncio.run(pool.amap(_logged_square, range(10)))
+        assert results == [x**2 for x in range(10)]
+        assert asyncio.run(pool.amap(_logged_square, range(10))) == results
+        assert _calls == list(range(10))
+
+
+def test_cached_map_return_results(tmp_path):
+    pool = CachedPool(SerialPool(), tmp_path / "cache.sqlite")
+    with pool, pytest.raises(ValueError, match="return_results"):
+        pool.map(_square, range(10), return_results=False)
+
+
+def test_task_keys_hash_seed():
+    # The keys of tasks with sets of strings don't depend on the hash seed:
+    code = (
+        "from schwimmbad.cache import _task_bytes; "
+        "print(_task_bytes(({'a', 'b', 'c'}, frozenset(['x', 'y', 'z']))).hex())"
+    )
+    keys = {
+        subprocess.run(
+            [sys.executable, "-c", code],
+            check=True,
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONHASHSEED": str(seed)},
+        ).stdout
+        for seed in range(5)
+    }
+    assert len(keys) == 1
+
+
+def test_task_keys_identity():
+    # Keys depend on the values in a task, not on which objects are the same:
+    s = [1, 2, 3]
+    t = [1, 2, 3]
+    assert _task_bytes((s, s)) == _task_bytes((s, t))
+    assert _task_bytes({"a": s, "b": s}) == _task_bytes({"a": s, "b": t})
+
+    # Tasks with reference cycles still get a key:
+    s.append(s)
+    assert _task_bytes(s) == _task_bytes(s)
@@ -0,0 +1,66 @@
+# type: ignore
+import threading
+import time
+
+import pytest
+
+from schwimmbad import MultiPool, SerialPool
+from schwimmbad.callbacks import BatchCallback
+
+
+def _square(x):
+    return x**2
+
+
+def test_batch_callback_size():
+    batches = []
+    threads = set()
+
+    def func(batch):
+        batches.append(batch)
+        threads.add(threading.get_ident())
+
+    with BatchCallback(func, size=10, interval=60) as callback:
+        results = SerialPool().map(_square, range(25), callback=callback)
+        assert list(results) == [x**2 for x in range(25)]
+
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert sum(batches, []) == [x**2 for x in range(25)]
+    assert threading.get_ident() not in threads
+
+
+def test_batch_callback_interval():
+    batches = []
+    with BatchCallback(batches.append, size=1000, interval=0.01) as callback:
+        callback(1)
+        callback(2)
+        time.sleep(0.2)
+        assert batches == [[1, 2]]
+        callback(3)
+    assert batches == [[1, 2], [3]]
+
+
+def test_batch_callback_error():
+    def func(batch):
+        msg = "failed"
+        raise RuntimeError(msg)
+
+    callback = BatchCallback(func, size=1)
+    callback(1)
+    with pytest.raises(RuntimeError):
+        callback.close()
+
+
+def test_multipool_batch_callback():
+    batches = []
+    with MultiPool(processes=2) as pool:
+        results = pool.map(_square, range(100), batch_callback=batches.append)
+        assert results == [x**2 for x in range(100)]
+        assert sorted(sum(batches, [])) == results
+
+        batches.clear()
+        callback = BatchCallback(batches.append, size=7)
+        results = pool.map(_square, range(100), chunksize=3, batch_callback=callback)
+        assert results == [x**2 for x in range(100)]
+        assert max(len(batch) for batch in batches) == 7
+        assert sorted(sum(batches, [])) == results
@@ -0,0 +1,128 @@
+# type: ignore
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from schwimmbad import MultiPool
+from schwimmbad.checkpoint import Journal
+
+
+def _square(x):
+    return x**2
+
+
+def _fail_on(bad):
+    def worker(x):
+        if x in bad:
+            msg = f"task {x} failed"
+            raise RuntimeError(msg)
+        return x**2
+
+    return worker
+
+
+def test_journal(tmp_path):
+    path = tmp_path / "journal"
+    assert Journal(path).load() == {}
+
+    with Journal(path, sync_interval=0) as journal:
+        for i in range(10):
+            journal.append(i, {"result": i})
+
+    assert Journal(path).load() == {i: {"result": i} for i in range(10)}
+
+    # a partially written record at the end is dropped...
+    size = path.stat().st_size
+    with path.open("ab") as f:
+        f.write(b"\x10\x00\x00")
+    assert len(Journal(path).load()) == 10
+    assert path.stat().st_size == size
+
+    # ...and new records are appended after the last complete one:
+    with Journal(path) as journal:
+        journal.append(10, None)
+    assert Journal(path).load()[10] is None
+
+    # results that pickle can't handle are pickled with dill:
+    with Journal(path) as journal:
+        journal.append(11, lambda: 11)
+    assert Journal(path).load()[11]() == 11
+
+
+def test_map_checkpoint(tmp_path):
+    path = tmp_path / "journal"
+
+    with MultiPool(processes=2) as pool:
+        with pytest.raises(RuntimeError):
+            pool.map(_fail_on({50}), range(100), checkpoint=path)
+
+        done = Journal(path).load()
+        assert 0 < len(done) < 100
+        assert all(done[i] == i**2 for i in done)
+
+        # resuming only evaluates the tasks that aren't in the journal:
+        mylist = []
+        results = pool.map(_square, range(100), checkpoint=path, callback=mylist.append)
+        assert results == [x**2 for x in range(100)]
+        assert len(mylist) == 100 - len(done)
+        assert len(Journal(path).load()) == 100
+
+
+def test_map_checkpoint_cost(tmp_path):
+    path = tmp_path / "journal"
+    with Journal(path) as journal:
+        journal.append(3, 9)
+
+    # the remaining tasks are run from the most to the least expensive:
+    mylist = []
+    with MultiPool(processes=1) as pool:
+        results = pool.map(
+            _square, range(6), checkpoint=path, cost=lambda x: x, callback=mylist.append
+        )
+    assert results == [x**2 for x in range(6)]
+    assert mylist == [25, 16, 4, 1, 0]
+
+
+def test_map_checkpoint_killed(tmp_path):
+    # Results that arrive in a burst are synced within sync_interval, even if
+    # no more results arrive before the process is killed:
+    path = tmp_path / "journal"
+    started = tmp_path / "started"
+    script = tmp_path / "script.py"
+    script.write_text(
+        textwrap.dedent(
+            f"""
+            import pathlib
+            import time
+
+            from schwimmbad import MultiPool
+            from schwimmbad.checkpoint import Journal
+
+            def worker(x):
+                if x == 9:
+                    pathlib.Path({str(started)!r}).touch()
+                    time.sleep(10)
+                return x**2
+
+            if __name__ == "__main__":
+                journal = Journal({str(path)!r}, sync_interval=0.5)
+                with MultiPool(2) as pool:
+                    pool.map(worker, range(10), checkpoint=journal)
+            """
+        )
+    )
+
+    proc = subprocess.Popen([sys.executable, str(script)])
+    try:
+        deadline = time.monotonic() + 30
+        while not started.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(1.5)
+    finally:
+        proc.kill()
+        proc.wait()
+
+    assert Journal(path).load() == {i: i**2 for i in range(9)}
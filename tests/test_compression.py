@@ -0,0 +1,95 @@
+# type: ignore
+import os
+import pickle
+
+import pytest
+
+from schwimmbad import MultiPool
+from schwimmbad.compression import Compressor
+from schwimmbad.serializers import CompressedSerializer, get_serializer
+
+
+def _repeat(x):
+    return [x] * 10_000
+
+
+def test_compressor():
+    compressor = Compressor("zlib", threshold=100)
+
+    # Small payloads aren't compressed:
+    data = b"abc" * 10
+    out = compressor.compress(data)
+    assert len(out) == len(data) + 1
+    assert bytes(compressor.decompress(out)) == data
+
+    data = b"abc" * 10_000
+    out = compressor.compress(data)
+    assert len(out) < len(data) / 10
+    assert bytes(compressor.decompress(out)) == data
+
+    counters = compressor.counters()
+    assert counters["payloads"] == 4
+    assert counters["compressed"] == 2
+    assert counters["raw_bytes"] == 2 * (30 + 30_000)
+
+
+def test_compressor_adaptive():
+    compressor = Compressor("zlib", threshold=100)
+    random = os.urandom(10_000)
+
+    # After a poor result, the next 1, 2, 4, ... payloads are skipped:
+    attempts = []
+    for _ in range(20):
+        before = compressor.counters()["compress_time"]
+        out = compressor.compress(random)
+        attempts.append(compressor.counters()["compress_time"] > before)
+        assert bytes(compressor.decompress(out)) == random
+    assert [i for i, tried in enumerate(attempts) if tried] == [0, 2, 5, 10, 19]
+    assert compressor.counters()["compressed"] == 0
+
+    # Once compression is tried again, a good result resets the backoff:
+    compressor = Compressor("zlib", threshold=100)
+    compressor.compress(random)
+    compressor.compress(b"a" * 10_000)
+    assert compressor.counters()["compressed"] == 0
+    compressor.compress(b"a" * 10_000)
+    assert compressor.counters()["compressed"] == 1
+    compressor.compress(random)
+    assert compressor._skip == 1
+
+
+def test_compressor_pickle():
+    compressor = Compressor("zlib", threshold=10)
+    # Within a process, unpickling gives back the same compressor:
+    assert pickle.loads(pickle.dumps(compressor)) is compressor
+
+    with pytest.raises(ValueError, match="codec"):
+        Compressor("gzip")
+
+
+def test_compressed_serializer():
+    serializer = get_serializer("pickle", compression="zlib")
+    assert isinstance(serializer, CompressedSerializer)
+    assert serializer.compressor.codec == "zlib"
+
+    data = {"a": ["abc"] * 100_000}
+    payload = serializer.dumps(data)
+    assert len(payload) < len(pickle.dumps(data)) / 2
+    assert serializer.loads(payload) == data
+
+    assert not isinstance(get_serializer(compression=False), CompressedSerializer)
+
+
+def test_multipool_compression():
+    with MultiPool(2, compression=Compressor("zlib", threshold=1024)) as pool:
+        pool.collect_stats = True
+        results = pool.map(_repeat, range(10))
+        assert results == [[x] * 10_000 for x in range(10)]
+
+        summary = pool.stats.summary()
+        assert pool.stats.compression["compressed"] > 0
+        assert summary["compression_ratio"] < 0.5
+        assert summary["wire_bytes"] < summary["result_bytes"]
+
+        pool.collect_stats = False
+        assert list(pool.imap(_repeat, range(3))) == [[x] * 10_000 for x in range(3)]
@@ -0,0 +1,37 @@
+# type: ignore
+import subprocess
+import sys
+
+import pytest
+
+import schwimmbad
+
+# Modules that only the backends that need them should import:
+_heavy = ["asyncio", "dill", "joblib", "mpi4py", "multiprocess", "numpy"]
+
+
+def _imported(code):
+    """Run ``code`` in a new interpreter, and return which of the heavy modules
+    it imported.
+    """
+    code += f"; import sys; print(' '.join(m for m in {_heavy!r} if m in sys.modules))"
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    return output.split()
+
+
+def test_lazy_import():
+    assert _imported("import schwimmbad") == []
+    assert _imported("import schwimmbad; schwimmbad.choose_pool()") == []
+    assert _imported("import schwimmbad; schwimmbad.choose_pool(threads=2)") == []
+    assert "joblib" in _imported("from schwimmbad import JoblibPool")
+
+
+def test_lazy_attributes():
+    from schwimmbad.multiprocessing import MultiPool
+
+    assert schwimmbad.MultiPool is MultiPool
+    assert set(schwimmbad.__all__) <= set(dir(schwimmbad))
+    with pytest.raises(AttributeError, match="NotAPool"):
+        schwimmbad.NotAPool  # noqa: B018
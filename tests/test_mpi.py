@@ -5,15 +5,52 @@ so this is a script that tests the MPIPool
 """
 
 # Standard library
+import asyncio
+import concurrent.futures
+import functools
+import itertools
+import os
 import random
+import tempfile
+import time
 
 from schwimmbad._test_helpers import _batch_function, _function, isclose
+from schwimmbad.error import PoolError
+from schwimmbad.sinks import ArraySink
 
 
 def _callback(x):
     pass
 
 
+def _lookup(shared, i):
+    return shared.get()[i]
+
+
+def _n_windows(_):
+    from schwimmbad.mpi import _windows
+
+    return len(_windows)
+
+
+def _row_sums(task):
+    _, rows = task
+    return rows.sum(axis=1)
+
+
+def _add(x, y):
+    return x + y
+
+
+class _Offset:
+    def __init__(self, offset):
+        self.offset = offset
+        self.table = list(range(1000))
+
+    def __call__(self, x):
+        return self.table[x] + self.offset
+
+
 def test_mpi(pool):
     all_tasks = [[random.random() for i in range(1000)]]
 
@@ -33,11 +70,155 @@ def test_mpi(pool):
 
         assert len(results) == len(tasks)
 
+    # test that changing the worker callable between maps is picked up
+    for offset in [0, 1, 1, 2]:
+        results = pool.map(_Offset(offset), range(100))
+        assert results == [x + offset for x in range(100)]
+
+    # test map with tasks sent in chunks
+    for chunksize in [7, "guided"]:
+        results = pool.map(_Offset(1), range(1000), chunksize=chunksize)
+        assert results == [x + 1 for x in range(1000)]
+
+    # test map with the most expensive tasks sent out first
+    results = pool.map(_Offset(1), range(100), cost=lambda x: x % 10)
+    assert results == [x + 1 for x in range(100)]
+
+    # test passing results on in batches
+    batches = []
+    results = pool.map(_Offset(1), range(100), batch_callback=batches.append)
+    assert results == [x + 1 for x in range(100)]
+    assert sorted(sum(batches, [])) == results
+
+    # test resuming a checkpointed map
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "journal")
+        results = pool.map(_Offset(1), range(50), checkpoint=path)
+        assert results == [x + 1 for x in range(50)]
+
+        mylist = []
+        results = pool.map(
+            _Offset(1), range(100), checkpoint=path, callback=mylist.append
+        )
+        assert results == [x + 1 for x in range(100)]
+        assert sorted(mylist) == [x + 1 for x in range(50, 100)]
+
+    # test submitting single calls
+    futures = {pool.submit(_add, x, y=x + 1): x for x in range(50)}
+    for future in concurrent.futures.as_completed(futures):
+        assert future.result() == 2 * futures[future] + 1
+
+    future = pool.submit(_Offset(1), pool.submit(_Offset(2), 3).result())
+    assert future.result() == 6
+
+    future = pool.submit(_Offset(1), None)
+    assert isinstance(future.exception(), TypeError)
+
+    # maps can't run while calls are in flight, but can once they are done
+    futures = [pool.submit(time.sleep, 0.01) for _ in range(10)]
+    try:
+        pool.map(_Offset(1), range(10))
+    except PoolError:
+        pass
+    else:
+        raise AssertionError("Expected a PoolError")
+    concurrent.futures.wait(futures)
+    assert pool.map(_Offset(1), range(10)) == [x + 1 for x in range(10)]
+
+    # test awaiting results from an asyncio event loop
+    async def run_async():
+        results = await pool.amap(_Offset(4), range(100), chunksize=3)
+        assert results == [x + 4 for x in range(100)]
+
+        results = [x async for x in pool.aimap_unordered(_Offset(4), range(100))]
+        assert sorted(results) == [x + 4 for x in range(100)]
+
+        # abandoning an aimap_unordered part way through shouldn't affect the
+        # next map
+        results = pool.aimap_unordered(_Offset(4), range(100))
+        async for _ in results:
+            break
+        await results.aclose()
+
+        results = await pool.amap(_Offset(5), range(10))
+        assert results == [x + 5 for x in range(10)]
+
+    asyncio.run(run_async())
+
+    # test lazy imap and imap_unordered
+    results = pool.imap(_Offset(2), range(1000), chunksize=3, lookahead=5)
+    assert list(results) == [x + 2 for x in range(1000)]
+
+    results = pool.imap_unordered(_Offset(2), iter(range(1000)), chunksize="guided")
+    assert sorted(results) == [x + 2 for x in range(1000)]
+
+    # abandoning an imap part way through shouldn't affect the next map
+    results = pool.imap(_Offset(3), range(1000))
+    assert list(itertools.islice(results, 10)) == [x + 3 for x in range(10)]
+    del results
+    assert pool.map(_Offset(4), range(10)) == [x + 4 for x in range(10)]
+
+    # test collecting timings
+    pool.collect_stats = True
+    assert pool.map(_Offset(1), range(100), chunksize=4) == list(range(1, 101))
+    assert len(pool.stats.tasks) == 100
+    assert all(task.worker.startswith("rank ") for task in pool.stats.tasks)
+    assert "rank 0" not in {task.worker for task in pool.stats.tasks}
+    assert pool.stats.summary()["n_workers"] == pool.size
+    pool.collect_stats = False
+
+    # test sharing data with the workers
+    shared = pool.share(bytes(range(100)))
+    results = pool.map(functools.partial(_lookup, shared), range(100))
+    assert results == list(range(100))
+
+    # test freeing the shared memory on all ranks
+    n_windows = _n_windows(None)
+    pool.release(shared)
+    assert _n_windows(None) == n_windows - 1
+    assert set(pool.map(_n_windows, range(4 * pool.size))) == {n_windows - 1}
+    try:
+        shared.get()
+    except PoolError:
+        pass
+    else:
+        raise AssertionError
+
+    try:
+        import numpy as np
+    except ImportError:
+        pass
+    else:
+        shared = pool.share(np.arange(1000.0)[::-1])
+        results = pool.map(functools.partial(_lookup, shared), range(1000))
+        assert results == list(np.arange(1000.0)[::-1])
+
+        # test writing results straight into an array
+        out = np.zeros(1000)
+        pool.map_into(_Offset(1), range(1000), ArraySink(out), chunksize=3)
+        assert np.all(out == np.arange(1000) + 1)
+
+        # test a vectorized batched map over the rows of an array file
+        with tempfile.TemporaryDirectory() as tmpdir:
+            data = np.arange(3000.0).reshape(1000, 3)
+            path = os.path.join(tmpdir, "data.npy")
+            np.save(path, data)
+            mm = np.load(path, mmap_mode="r")
+            results = pool.batched_map(_row_sums, mm, n_batches=9, vectorize=True)
+            assert np.all(results == data.sum(axis=1))
+
     # test batched map
     results = pool.batched_map(_batch_function, tasks)
     for r in results:
         assert all([isclose(x, 42.01) for x in r])
 
+    results = pool.batched_map(
+        _batch_function, tasks, n_batches=4 * pool.size, costs=range(len(tasks))
+    )
+    assert len(results) == 4 * pool.size
+    for r in results:
+        assert all([isclose(x, 42.01) for x in r])
+
     print("All tests passed")
 
 
@@ -0,0 +1,13 @@
+# type: ignore
+"""
+I couldn't figure out how to get py.test and MPI to play nice together,
+so this is a script that tests the hierarchical MPIPool
+"""
+
+from test_mpi import test_mpi
+
+from schwimmbad.mpi import MPIPool
+
+if __name__ == "__main__":
+    with MPIPool(groups=2, prefetch=2) as pool:
+        test_mpi(pool)
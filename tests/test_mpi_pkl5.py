@@ -0,0 +1,38 @@
+# type: ignore
+"""
+I couldn't figure out how to get py.test and MPI to play nice together,
+so this is a script that tests the MPIPool with out-of-band buffers
+"""
+
+import sys
+
+from test_mpi import test_mpi
+
+from schwimmbad.mpi import MPIPool
+
+try:
+    import numpy as np
+    from mpi4py.util import pkl5  # noqa: F401
+except ImportError:
+    print("Skipping: numpy and mpi4py>=3.1 are required to run this test")
+    sys.exit(0)
+
+
+def _scale(arr):
+    return 2 * arr
+
+
+def test_mpi_pkl5(pool):
+    test_mpi(pool)
+
+    tasks = [np.full(2**18, float(i)) for i in range(16)]
+    results = pool.map(_scale, tasks)
+    for i, r in enumerate(results):
+        assert np.all(r == 2.0 * i)
+
+    print("All pkl5 tests passed")
+
+
+if __name__ == "__main__":
+    with MPIPool(use_pkl5=True) as pool:
+        test_mpi_pkl5(pool)
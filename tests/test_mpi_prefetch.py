@@ -0,0 +1,68 @@
+# type: ignore
+"""
+I couldn't figure out how to get py.test and MPI to play nice together,
+so this is a script that tests the MPIPool with multiple tasks in flight per
+worker
+"""
+
+import time
+
+from test_mpi import test_mpi
+
+from schwimmbad.mpi import MPIPool, _next_tag, _steal_victims
+
+
+def _sleep(x):
+    # One slow task, so that the tasks queued behind it are stolen:
+    time.sleep(0.5 if x == 0 else 0.01)
+    return x
+
+
+def _uneven_sleep(x):
+    # Slow tasks on several workers, so that chunks are stolen between them:
+    time.sleep(0.2 if x % 7 == 0 else 0.005)
+    return x
+
+
+def _identity(x):
+    return x
+
+
+def test_steal_victims():
+    # One idle worker, and workers with 3 and 2 chunks queued:
+    queued = {1: 0, 2: 3, 3: 2, 4: 1}
+    assert _steal_victims(queued, set()) == [2]
+
+    # A steal is already in progress for each idle worker:
+    assert _steal_victims(queued, {2}) == []
+    assert _steal_victims({1: 1, 2: 3, 3: 2, 4: 2}, {2}) == []
+
+
+def test_next_tag():
+    # Tags wrap around, skipping those still in use:
+    assert _next_tag(-1, {}, 3) == 0
+    assert _next_tag(2, {3: 0, 0: 4}, 3) == 1
+    assert _next_tag(3, {}, 3) == 0
+
+
+if __name__ == "__main__":
+    test_steal_victims()
+    test_next_tag()
+
+    with MPIPool(prefetch=4) as pool:
+        test_mpi(pool)
+
+        n = 16 * pool.size
+        assert pool.map(_uneven_sleep, range(n)) == list(range(n))
+
+        assert pool.map(_sleep, range(8 * pool.size)) == list(range(8 * pool.size))
+        results = pool.imap_unordered(_sleep, range(8 * pool.size))
+        assert sorted(results) == list(range(8 * pool.size))
+
+        # Many more chunks than tags, which have to be reused:
+        pool._tag_ub = pool.size * pool.prefetch
+        n = 64 * pool.size
+        assert pool.map(_uneven_sleep, range(n)) == list(range(n))
+        assert list(pool.imap(_identity, range(n))) == list(range(n))
+        futures = [pool.submit(_identity, x) for x in range(n)]
+        assert [f.result() for f in futures] == list(range(n))
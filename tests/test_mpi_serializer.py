@@ -0,0 +1,42 @@
+# type: ignore
+"""
+I couldn't figure out how to get py.test and MPI to play nice together,
+so this is a script that tests the MPIPool with an explicit serializer and
+compression
+"""
+
+from test_mpi import test_mpi
+
+from schwimmbad.compression import Compressor
+from schwimmbad.mpi import MPIPool
+
+
+def test_closure(pool):
+    # Closures are serialized with dill, without use_dill:
+    offset = 3
+    assert pool.map(lambda x: x + offset, range(10)) == list(range(3, 13))
+
+    # Tasks and results that pickle can't handle fall back to dill:
+    tasks = [lambda x: x * 3] * 3
+    assert pool.map(lambda g: g(2), tasks) == [6, 6, 6]
+    assert pool.map(lambda x: lambda: x, range(3))[2]() == 2
+
+
+def _repeat(x):
+    return [x] * 10_000
+
+
+def test_compression(pool):
+    pool.collect_stats = True
+    assert pool.map(_repeat, range(10)) == [[x] * 10_000 for x in range(10)]
+    assert pool.stats.compression["compressed"] >= 10
+    assert pool.stats.summary()["compression_ratio"] < 0.5
+    pool.collect_stats = False
+
+
+if __name__ == "__main__":
+    compressor = Compressor("zlib", threshold=1024)
+    with MPIPool(serializer="pickle", compression=compressor, prefetch=2) as pool:
+        test_closure(pool)
+        test_compression(pool)
+        test_mpi(pool)
@@ -1,8 +1,37 @@
 # type: ignore
+import asyncio
+import concurrent.futures
+import functools
+import itertools
 import random
+import sys
 
-from schwimmbad import JoblibPool, MultiPool, SerialPool
+import pytest
+
+from schwimmbad import JoblibPool, MultiPool, SerialPool, ThreadPool
 from schwimmbad._test_helpers import _function, isclose
+from schwimmbad.sinks import ArraySink
+
+
+def _double(x):
+    return 2 * x
+
+
+def _lookup(shared, i):
+    return int(shared.get()[i])
+
+
+def _divide(x, y=1):
+    return x / y
+
+
+def _row_sums(task):
+    _, rows = task
+    return rows.sum(axis=1)
+
+
+def _is_imported(name):
+    return name in sys.modules
 
 
 class PoolTestBase:
@@ -48,6 +77,153 @@ class PoolTestBase:
 
         pool.close()
 
+    def test_map_cost(self):
+        pool = self._make_pool()
+
+        tasks = list(range(100))
+        mylist = []
+        results = pool.map(_double, tasks, callback=mylist.append, cost=_double)
+        assert list(results) == [2 * x for x in tasks]
+        assert sorted(mylist) == [2 * x for x in tasks]
+
+        results = pool.map(_double, iter(tasks), cost=[x % 7 for x in tasks])
+        assert list(results) == [2 * x for x in tasks]
+
+        with pytest.raises(ValueError):
+            pool.map(_double, tasks, cost=[1, 2, 3])
+
+        pool.close()
+
+    def test_imap(self):
+        pool = self._make_pool()
+
+        mylist = []
+        results = pool.imap(_double, range(100), callback=mylist.append)
+        assert list(results) == [2 * x for x in range(100)]
+        assert mylist == [2 * x for x in range(100)]
+
+        results = pool.imap_unordered(_double, range(100), callback=mylist.append)
+        assert sorted(results) == [2 * x for x in range(100)]
+        assert len(mylist) == 200
+
+        # tasks should be pulled lazily, so this works on an infinite generator:
+        results = pool.imap(_double, itertools.count())
+        assert list(itertools.islice(results, 10)) == [2 * x for x in range(10)]
+
+        pool.close()
+
+    def test_submit(self):
+        pool = self._make_pool()
+
+        futures = {pool.submit(_divide, x, y=2): x for x in range(20)}
+        for future in concurrent.futures.as_completed(futures):
+            assert future.result() == futures[future] / 2
+
+        # the result of one call can be passed on to the next:
+        future = pool.submit(_divide, 12, 2)
+        future = pool.submit(_divide, future.result(), y=3)
+        assert future.result() == 2
+
+        future = pool.submit(_divide, 1, 0)
+        with pytest.raises(ZeroDivisionError):
+            future.result()
+
+        pool.close()
+
+    def test_async(self):
+        pool = self._make_pool()
+
+        async def run():
+            mylist = []
+            results = await pool.amap(_double, range(100), callback=mylist.append)
+            assert list(results) == [2 * x for x in range(100)]
+            assert mylist == [2 * x for x in range(100)]
+
+            # the event loop keeps running other tasks while waiting:
+            ticks = asyncio.create_task(asyncio.sleep(0))
+            results = [x async for x in pool.aimap_unordered(_double, range(100))]
+            assert sorted(results) == [2 * x for x in range(100)]
+            assert ticks.done()
+
+        asyncio.run(run())
+        pool.close()
+
+    def test_map_into(self, tmp_path):
+        np = pytest.importorskip("numpy")
+        pool = self._make_pool()
+
+        out = np.zeros(100)
+        pool.map_into(_double, range(100), ArraySink(out, buffer_size=7))
+        assert np.all(out == 2 * np.arange(100))
+
+        path = tmp_path / "results.npy"
+        out = np.lib.format.open_memmap(path, "w+", float, (100,))
+        pool.map_into(_double, iter(range(100)), ArraySink(out))
+        del out
+        assert np.all(np.load(path) == 2 * np.arange(100))
+
+        pool.close()
+
+    def test_collect_stats(self):
+        pool = self._make_pool()
+        assert pool.stats is None
+
+        pool.collect_stats = True
+        mylist = []
+        results = pool.map(_double, range(50), callback=mylist.append)
+        assert list(results) == [2 * x for x in range(50)]
+        assert sorted(mylist) == [2 * x for x in range(50)]
+
+        stats = pool.stats
+        assert [task.index for task in stats.tasks] == list(range(50))
+        for task in stats.tasks:
+            assert task.worker is not None
+            assert task.task_bytes > 0
+            assert task.result_bytes > 0
+            assert task.submitted <= task.started + 1e-3
+            assert task.finished <= task.received + 1e-3
+        summary = stats.summary()
+        assert summary["n_tasks"] == 50
+        assert 0 < summary["compute_time"]
+
+        # Other options of map() still apply:
+        results = pool.map(_double, range(10), cost=_double)
+        assert list(results) == [2 * x for x in range(10)]
+        assert len(pool.stats.tasks) == 10
+
+        pool.close()
+
+    def test_batched_map_vectorize(self, tmp_path):
+        np = pytest.importorskip("numpy")
+        pool = self._make_pool()
+
+        data = np.arange(3000.0).reshape(1000, 3)
+        results = pool.batched_map(_row_sums, data, n_batches=7, vectorize=True)
+        assert np.all(results == data.sum(axis=1))
+
+        # Rows of a file-backed array are mapped by the workers:
+        path = tmp_path / "data.npy"
+        out = np.lib.format.open_memmap(path, "w+", float, data.shape)
+        out[:] = data
+        out.flush()
+        mm = np.load(path, mmap_mode="r")
+        results = pool.batched_map(_row_sums, mm, n_batches=7, vectorize=True)
+        assert np.all(results == data.sum(axis=1))
+
+        pool.close()
+
+    def test_share(self):
+        np = pytest.importorskip("numpy")
+        pool = self._make_pool()
+
+        for data in [np.arange(100)[::-1], bytes(range(100))]:
+            shared = pool.share(data)
+            worker = functools.partial(_lookup, shared)
+            results = pool.map(worker, range(10))
+            assert list(results) == list(data[:10])
+
+        pool.close()
+
 
 class TestSerialPool(PoolTestBase):
     def setup_method(self):
@@ -59,6 +235,55 @@ class TestMultiPool(PoolTestBase):
         self.PoolClass = MultiPool
 
 
+class TestMultiPoolDill(PoolTestBase):
+    def setup_method(self):
+        self.PoolClass = MultiPool
+
+    def _make_pool(self):
+        return self.PoolClass(serializer="dill")
+
+
+class TestMultiPoolForkserver(PoolTestBase):
+    def setup_method(self):
+        self.PoolClass = MultiPool
+
+    def _make_pool(self):
+        return self.PoolClass(start_method="forkserver", preload=["colorsys"])
+
+
+@pytest.mark.parametrize("start_method", ["fork", "spawn", "forkserver"])
+def test_multipool_preload(start_method):
+    with MultiPool(2, start_method=start_method, preload=["colorsys"]) as pool:
+        assert pool._ctx.get_start_method() == start_method
+        assert pool.map(_is_imported, ["colorsys"] * 4) == [True] * 4
+
+
 class TestJoblibPool(PoolTestBase):
     def setup_method(self):
         self.PoolClass = JoblibPool
+
+
+def test_joblib_imap_old_version(monkeypatch):
+    import schwimmbad.jl
+
+    # Versions of joblib before 1.4 don't support unordered generators:
+    def parallel(*args, return_as="list", **kwargs):
+        if return_as == "generator_unordered":
+            msg = f"unsupported return_as: {return_as}"
+            raise ValueError(msg)
+        return JoblibParallel(*args, return_as=return_as, **kwargs)
+
+    JoblibParallel = schwimmbad.jl.Parallel
+    monkeypatch.setattr(schwimmbad.jl, "Parallel", parallel)
+
+    pool = JoblibPool(2)
+    mylist = []
+    results = pool.imap_unordered(_double, range(10), callback=mylist.append)
+    assert sorted(results) == [2 * x for x in range(10)]
+    assert sorted(mylist) == [2 * x for x in range(10)]
+    assert list(pool.imap(_double, range(10))) == [2 * x for x in range(10)]
+
+
+class TestThreadPool(PoolTestBase):
+    def setup_method(self):
+        self.PoolClass = ThreadPool
@@ -0,0 +1,130 @@
+# type: ignore
+import pickle
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from schwimmbad import MultiPool
+from schwimmbad.serializers import (
+    CloudpickleSerializer,
+    DillSerializer,
+    MsgpackNumpySerializer,
+    PickleSerializer,
+    Serializer,
+    get_serializer,
+)
+
+
+def _square(x):
+    return x**2
+
+
+@pytest.mark.parametrize("name", ["pickle", "dill", "cloudpickle", "msgpack"])
+def test_roundtrip(name):
+    if name == "cloudpickle":
+        pytest.importorskip("cloudpickle")
+    if name == "msgpack":
+        pytest.importorskip("msgpack")
+        pytest.importorskip("msgpack_numpy")
+    np = pytest.importorskip("numpy")
+
+    serializer = get_serializer(name)
+    data = [1, 2.5, "three", {"four": [4]}, None]
+    assert serializer.loads(serializer.dumps(data)) == data
+
+    arr = np.arange(10.0)
+    assert np.all(serializer.loads(serializer.dumps(arr)) == arr)
+
+    func = serializer.loads_function(serializer.dumps_function(lambda x: x + 1))
+    assert func(1) == 2
+
+    # Serializers are sent to the workers along with the tasks:
+    assert isinstance(pickle.loads(pickle.dumps(serializer)), type(serializer))
+
+
+def test_pickle_fallback():
+    serializer = PickleSerializer()
+    data = serializer.dumps([1, lambda x: x * 2])
+    assert serializer.loads(data)[1](3) == 6
+
+    with pytest.raises((pickle.PicklingError, AttributeError)):
+        PickleSerializer(fallback=False).dumps(lambda x: x)
+
+    # Through a compressor, which returns uncompressed payloads as memoryviews:
+    serializer = get_serializer(compression="zlib")
+    assert serializer.loads(serializer.dumps([lambda x: x * 2]))[0](3) == 6
+
+
+def test_get_serializer():
+    assert isinstance(get_serializer(), PickleSerializer)
+    assert isinstance(get_serializer("dill"), DillSerializer)
+    serializer = DillSerializer()
+    assert get_serializer(serializer) is serializer
+
+    with pytest.raises(ValueError, match="Unknown serializer"):
+        get_serializer("json")
+
+    # Subclasses have to implement both dumps() and loads():
+    class DumpsOnly(Serializer):
+        def dumps(self, obj):
+            return b""
+
+    with pytest.raises(TypeError):
+        Serializer()
+    with pytest.raises(TypeError):
+        DumpsOnly()
+
+
+def test_optional_serializers():
+    for cls, module in [
+        (CloudpickleSerializer, "cloudpickle"),
+        (MsgpackNumpySerializer, "msgpack"),
+    ]:
+        try:
+            __import__(module)
+        except ImportError:
+            with pytest.raises(ImportError, match=module):
+                cls()
+
+
+def test_multipool_serializers():
+    offset = 3
+
+    for serializer in ["pickle", "dill", DillSerializer()]:
+        with MultiPool(2, serializer=serializer) as pool:
+            assert pool.map(_square, range(10)) == [x**2 for x in range(10)]
+            assert list(pool.imap(_square, range(10), chunksize=3)) == [
+                x**2 for x in range(10)
+            ]
+
+            # Closures are serialized with dill, as are tasks that pickle
+            # can't handle:
+            results = pool.map(lambda x: x + offset, range(10))
+            assert results == [x + offset for x in range(10)]
+            tasks = [lambda i=i: i for i in range(5)]
+            assert pool.map(lambda task: task(), tasks) == list(range(5))
+
+
+def test_multipool_main_lambdas(tmp_path):
+    # Unlike functions defined in a test module, functions defined in __main__
+    # can only be unpickled with dill:
+    script = tmp_path / "script.py"
+    script.write_text(
+        textwrap.dedent(
+            """
+            from schwimmbad import MultiPool
+
+            if __name__ == "__main__":
+                for compression in [None, True]:
+                    with MultiPool(2, compression=compression) as pool:
+                        tasks = [lambda x: x * 3] * 3
+                        print(pool.map(lambda g: g(2), tasks))
+            """
+        )
+    )
+    output = subprocess.run(
+        [sys.executable, str(script)], check=True, capture_output=True, text=True
+    ).stdout
+    assert output.split("\n")[:2] == ["[6, 6, 6]"] * 2
@@ -0,0 +1,34 @@
+# type: ignore
+import pytest
+
+from schwimmbad.sinks import ResultSink
+
+
+class _ListSink(ResultSink):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writes = []
+
+    def write(self, start, results):
+        self.writes.append((start, results))
+
+
+def test_result_sink():
+    sink = _ListSink(buffer_size=5)
+    for i in [3, 0, 1, 7]:
+        sink.add(i, str(i))
+    assert sink.writes == []
+
+    # consecutive results are written together once the buffer is full:
+    sink.add(2, "2")
+    assert sink.writes == [(0, ["0", "1", "2", "3"]), (7, ["7"])]
+
+    sink.add(8, "8")
+    sink.flush()
+    assert sink.writes[-1] == (8, ["8"])
+
+    sink.flush()
+    assert len(sink.writes) == 3
+
+    with pytest.raises(ValueError):
+        _ListSink(buffer_size=0)
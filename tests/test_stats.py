@@ -0,0 +1,82 @@
+# type: ignore
+import json
+import time
+
+import pytest
+
+from schwimmbad import JoblibPool, MultiPool, SerialPool, ThreadPool
+
+
+def _square(x):
+    return x**2
+
+
+def _sleep(x):
+    time.sleep(0.005)
+    return x
+
+
+def test_map_stats(tmp_path):
+    pool = SerialPool()
+    pool.collect_stats = True
+    assert list(pool.map(_square, range(10))) == [x**2 for x in range(10)]
+
+    stats = pool.stats
+    assert len(stats.tasks) == 10
+    assert stats.wall_time >= 0
+    assert list(stats.workers()) == [stats.tasks[0].worker]
+    assert all(task.queue_wait >= 0 for task in stats.tasks)
+
+    summary = stats.summary()
+    assert summary["n_tasks"] == 10
+    assert summary["n_workers"] == 1
+    assert summary["task_bytes"] == sum(task.task_bytes for task in stats.tasks)
+    assert 0 <= summary["utilization"] <= 1
+
+    path = tmp_path / "trace.json"
+    trace = stats.to_chrome_trace(path)
+    with path.open() as f:
+        assert json.load(f) == trace
+
+    slices = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert len(slices) == 5 * 10
+    assert {event["name"] for event in slices} == {
+        "serialize task",
+        "deserialize task",
+        "compute",
+        "serialize result",
+        "deserialize result",
+    }
+    assert all(event["ts"] >= 0 and event["dur"] >= 0 for event in slices)
+
+
+def test_map_stats_return_results():
+    pool = SerialPool()
+    pool.collect_stats = True
+    results = []
+    pool._map_with_stats(
+        pool.map, _square, range(5), callback=results.append, return_results=False
+    )
+    assert results == [x**2 for x in range(5)]
+    assert len(pool.stats.tasks) == 5
+
+
+@pytest.mark.parametrize(
+    ("make_pool", "kwargs"),
+    [
+        (lambda: MultiPool(2), {"chunksize": 1}),
+        (lambda: ThreadPool(2), {}),
+        (lambda: JoblibPool(2, batch_size=1), {}),
+    ],
+)
+def test_map_stats_transfer_time(make_pool, kwargs):
+    # Results are recorded as they arrive, and the time that tasks wait for a
+    # free worker is reported separately, so the transfer time is only the
+    # time it takes to send back a result:
+    with make_pool() as pool:
+        pool.collect_stats = True
+        assert pool.map(_sleep, range(100), **kwargs) == list(range(100))
+
+    summary = pool.stats.summary()
+    assert summary["queue_wait"] > 0
+    assert summary["transfer_time"] / summary["n_tasks"] < 0.05
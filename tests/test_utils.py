@@ -47,8 +47,50 @@ def test_batch_tasks():
         batch_tasks(100, n_tasks=100, data=data[:100])
 
 
+def test_batch_tasks_costs():
+    # Equal costs give the same batches as no costs:
+    assert batch_tasks(3, n_tasks=9, costs=[1] * 9) == batch_tasks(3, n_tasks=9)
+    assert batch_tasks(3, n_tasks=10, costs=[0] * 10) == batch_tasks(3, n_tasks=10)
+
+    # One expensive task gets a batch of its own:
+    tasks = batch_tasks(3, n_tasks=10, costs=[100] + [1] * 9, start_idx=5)
+    assert tasks == [(5, 6), (6, 11), (11, 15)]
+
+    # Every batch gets at least one task:
+    tasks = batch_tasks(4, n_tasks=6, costs=[0, 0, 0, 0, 0, 100])
+    assert tasks == [(0, 3), (3, 4), (4, 5), (5, 6)]
+
+    tasks = batch_tasks(2, data=range(4), costs=[3, 1, 1, 1], include_idx=False)
+    assert tasks == [[0], [1, 2, 3]]
+
+    with pytest.raises(ValueError):
+        batch_tasks(2, n_tasks=4, costs=[1, 1, 1])
+
+    with pytest.raises(ValueError):
+        batch_tasks(2, n_tasks=2, costs=[1, -1])
+
+
+def test_batch_tasks_vectorize():
+    data = np.arange(300.0).reshape(100, 3)
+    tasks = batch_tasks(3, data=data, vectorize=True)
+    assert [idx for idx, _ in tasks] == [(0, 34), (34, 67), (67, 100)]
+    for (i1, i2), batch in tasks:
+        assert isinstance(batch, np.ndarray)
+        assert np.shares_memory(batch, data)
+        assert np.all(batch == data[i1:i2])
+
+    tasks = batch_tasks(2, data=[1, 2, 3], vectorize=True, include_idx=False)
+    assert np.all(tasks[0] == [1, 2])
+    assert np.all(tasks[1] == [3])
+
+
 @pytest.mark.parametrize(
-    "kwargs", [{"mpi": False, "processes": 1}, {"mpi": False, "processes": 2}]
+    "kwargs",
+    [
+        {"mpi": False, "processes": 1},
+        {"mpi": False, "processes": 2},
+        {"mpi": False, "threads": 2},
+    ],
 )
 def test_choose_pool(kwargs):
     with choose_pool(**kwargs) as pool: